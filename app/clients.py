@@ -1,6 +1,20 @@
 import anthropic
-from openai import OpenAI
+import asyncio
+import atexit
+import openai
+from openai import AsyncOpenAI, OpenAI
 import os
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Iterator
+
+from loguru import logger
+
+import project_config
+from app.llm_cache import llm_cache
 
 LLAMA3_API = "http://80.209.242.40:8000/v1"
 LLAMA3_KEY = "dummy-key2"
@@ -14,37 +28,386 @@ llama_params = {
 CLAUDE_KEY = os.environ.get("CLAUDE_API_TOKEN", "")
 CLAUDE_MODEL = "claude-sonnet-4-20250514"
 
-client = OpenAI(
-    base_url = LLAMA3_API,
-    api_key = LLAMA3_KEY
+claude_params = {
+        "max_tokens": 1024
+    }
+
+# Transient failures worth another attempt, client errors are raised immediately
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    anthropic.APIConnectionError,
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
 )
 
-def query_llama(query: str, params=llama_params) -> str:
-    response = client.chat.completions.create(
+
+class LatencyStats:
+    """Request counters and latencies of the most recent requests of one backend."""
+
+    def __init__(self, window=1000):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += not ok
+            self.latencies.append(latency)
+
+    def summary(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "p50": statistics.median(latencies) if latencies else None,
+            "p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+        }
+
+
+class LLMClientManager:
+    """
+    Persistent LLM clients shared by all sessions of the process.
+    Every backend gets a concurrency cap, requests time out and transient failures are
+    retried with exponential backoff. All async calls run on one long-lived event loop on
+    a daemon thread (run() submits to it from any thread), so every session shares its
+    async clients, their connection pools and the asyncio semaphores. Sync callers share
+    a threading semaphore.
+    """
+
+    def __init__(self, timeout=None, max_retries=None, backoff_base=None, backoff_max=None, concurrency=None):
+        self.timeout = timeout or project_config.LLM_TIMEOUT
+        self.max_retries = project_config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base or project_config.LLM_BACKOFF_BASE
+        self.backoff_max = backoff_max or project_config.LLM_BACKOFF_MAX
+        self.concurrency = concurrency or project_config.LLM_CONCURRENCY
+        self.semaphores = {backend: threading.BoundedSemaphore(n) for backend, n in self.concurrency.items()}
+        self.stats = {backend: LatencyStats() for backend in self.concurrency}
+
+        # Retries are done here, not by the SDKs, so that they respect the concurrency cap
+        self.llama = OpenAI(base_url=LLAMA3_API, api_key=LLAMA3_KEY, timeout=self.timeout, max_retries=0)
+        self.claude = anthropic.Anthropic(api_key=CLAUDE_KEY, timeout=self.timeout, max_retries=0)
+        self._async_clients = {}
+        self._async_semaphores = {backend: asyncio.Semaphore(n) for backend, n in self.concurrency.items()}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The shared event loop, started on first use."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-event-loop", daemon=True).start()
+        return self._loop
+
+    def run(self, coroutine):
+        """Run a coroutine on the shared event loop from a thread outside it and return its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def _check_loop(self):
+        if asyncio.get_running_loop() is not self._loop:
+            raise RuntimeError("Async LLM calls must run on the shared event loop, use clients.run()")
+
+    def async_client(self, backend: str):
+        self._check_loop()
+        if backend not in self._async_clients:
+            if backend == "llama":
+                client = AsyncOpenAI(base_url=LLAMA3_API, api_key=LLAMA3_KEY, timeout=self.timeout, max_retries=0)
+            else:
+                client = anthropic.AsyncAnthropic(api_key=CLAUDE_KEY, timeout=self.timeout, max_retries=0)
+            self._async_clients[backend] = client
+        return self._async_clients[backend]
+
+    def async_semaphore(self, backend: str) -> asyncio.Semaphore:
+        """Process-wide concurrency cap of the backend for async callers, waiters are served in order."""
+        self._check_loop()
+        return self._async_semaphores[backend]
+
+    async def _aclose(self):
+        for client in self._async_clients.values():
+            await client.close()
+        self._async_clients.clear()
+
+    def close(self):
+        """Close the connection pools and stop the shared event loop, run at interpreter exit."""
+        self.llama.close()
+        self.claude.close()
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _should_retry(self, backend: str, attempt: int, error: Exception) -> bool:
+        if not isinstance(error, RETRYABLE_ERRORS) or attempt >= self.max_retries:
+            return False
+        self.stats[backend].retries += 1
+        logger.warning(f"{backend} request failed ({error}), retry {attempt + 1}/{self.max_retries}")
+        return True
+
+    def call(self, backend: str, request):
+        """Run request() under the backend's concurrency cap with retries."""
+        with self.semaphores[backend]:
+            attempt = 0
+            while True:
+                start = time.perf_counter()
+                try:
+                    result = request()
+                    self.stats[backend].record(time.perf_counter() - start, ok=True)
+                    return result
+                except Exception as e:
+                    self.stats[backend].record(time.perf_counter() - start, ok=False)
+                    if not self._should_retry(backend, attempt, e):
+                        raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def acall(self, backend: str, request):
+        """Await request() under the backend's concurrency cap with retries."""
+        async with self.async_semaphore(backend):
+            attempt = 0
+            while True:
+                start = time.perf_counter()
+                try:
+                    result = await request()
+                    self.stats[backend].record(time.perf_counter() - start, ok=True)
+                    return result
+                except Exception as e:
+                    self.stats[backend].record(time.perf_counter() - start, ok=False)
+                    if not self._should_retry(backend, attempt, e):
+                        raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+    def stream(self, backend: str, open_stream, read_deltas) -> Iterator[str]:
+        """
+        Yield text deltas of a streamed request, holding a concurrency slot until the end.
+        Only opening the stream is retried, a stream that already produced text is not.
+        """
+        with self.semaphores[backend]:
+            attempt = 0
+            while True:
+                start = time.perf_counter()
+                try:
+                    stream = open_stream()
+                    break
+                except Exception as e:
+                    self.stats[backend].record(time.perf_counter() - start, ok=False)
+                    if not self._should_retry(backend, attempt, e):
+                        raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+            ok = False
+            try:
+                yield from read_deltas(stream)
+                ok = True
+            finally:
+                self.stats[backend].record(time.perf_counter() - start, ok=ok)
+
+    async def astream(self, backend: str, open_stream, read_deltas) -> AsyncIterator[str]:
+        async with self.async_semaphore(backend):
+            attempt = 0
+            while True:
+                start = time.perf_counter()
+                try:
+                    stream = await open_stream()
+                    break
+                except Exception as e:
+                    self.stats[backend].record(time.perf_counter() - start, ok=False)
+                    if not self._should_retry(backend, attempt, e):
+                        raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+            ok = False
+            try:
+                async for delta in read_deltas(stream):
+                    yield delta
+                ok = True
+            finally:
+                self.stats[backend].record(time.perf_counter() - start, ok=ok)
+
+    def metrics(self) -> dict:
+        return {backend: stats.summary() for backend, stats in self.stats.items()}
+
+
+clients = LLMClientManager()
+atexit.register(clients.close)
+
+
+def llama_messages(query: str) -> list:
+    return [{"role": "user", "content": query}]
+
+
+def query_llama(query: str, params=llama_params, cache=False) -> str:
+    """cache=True serves and stores the response in the LLM cache"""
+    if cache and (res := llm_cache.get(LLAMA3_MODEL, params, query)) is not None:
+        return res
+
+    response = clients.call("llama", lambda: clients.llama.chat.completions.create(
         model=LLAMA3_MODEL,
-        messages=[
-            {"role": "user", "content": query}
-        ],
+        messages=llama_messages(query),
         **params
-    )
+    ))
 
     res = response.choices[0].message.content
+    if cache:
+        llm_cache.put(LLAMA3_MODEL, params, query, res)
     return res
 
-def query_claude(query: str) -> str:
-    client = anthropic.Anthropic(api_key=CLAUDE_KEY)
-    
-    response = client.messages.create(
+async def aquery_llama(query: str, params=llama_params, cache=False) -> str:
+    if cache and (res := llm_cache.get(LLAMA3_MODEL, params, query)) is not None:
+        return res
+
+    response = await clients.acall("llama", lambda: clients.async_client("llama").chat.completions.create(
+        model=LLAMA3_MODEL,
+        messages=llama_messages(query),
+        **params
+    ))
+
+    res = response.choices[0].message.content
+    if cache:
+        llm_cache.put(LLAMA3_MODEL, params, query, res)
+    return res
+
+def query_claude(query: str, params=claude_params, cache=False) -> str:
+    if cache and (res := llm_cache.get(CLAUDE_MODEL, params, query)) is not None:
+        return res
+
+    response = clients.call("claude", lambda: clients.claude.messages.create(
         model=CLAUDE_MODEL,
-        max_tokens=1024,
-        messages=[
-            {"role": "user", "content": query}
-        ]
-    )
+        messages=llama_messages(query),
+        **params
+    ))
 
     res = response.content[0].text
+    if cache:
+        llm_cache.put(CLAUDE_MODEL, params, query, res)
     return res
 
+async def aquery_claude(query: str, params=claude_params, cache=False) -> str:
+    if cache and (res := llm_cache.get(CLAUDE_MODEL, params, query)) is not None:
+        return res
+
+    response = await clients.acall("claude", lambda: clients.async_client("claude").messages.create(
+        model=CLAUDE_MODEL,
+        messages=llama_messages(query),
+        **params
+    ))
+
+    res = response.content[0].text
+    if cache:
+        llm_cache.put(CLAUDE_MODEL, params, query, res)
+    return res
+
+def openai_deltas(stream) -> Iterator[str]:
+    for chunk in stream:
+        if chunk.choices and (delta := chunk.choices[0].delta.content):
+            yield delta
+
+async def aopenai_deltas(stream) -> AsyncIterator[str]:
+    async for chunk in stream:
+        if chunk.choices and (delta := chunk.choices[0].delta.content):
+            yield delta
+
+def anthropic_deltas(stream) -> Iterator[str]:
+    with stream:
+        for event in stream:
+            if event.type == "content_block_delta" and event.delta.type == "text_delta":
+                yield event.delta.text
+
+async def aanthropic_deltas(stream) -> AsyncIterator[str]:
+    async with stream:
+        async for event in stream:
+            if event.type == "content_block_delta" and event.delta.type == "text_delta":
+                yield event.delta.text
+
+def stream_llama(query: str, params=llama_params, cache=False) -> Iterator[str]:
+    """
+    Yield the response text in chunks as the model generates it.
+    A cache hit is yielded as a single chunk, a completed stream is stored in the cache.
+    """
+    if cache and (res := llm_cache.get(LLAMA3_MODEL, params, query)) is not None:
+        yield res
+        return
+
+    chunks = []
+    for delta in clients.stream("llama", lambda: clients.llama.chat.completions.create(
+        model=LLAMA3_MODEL,
+        messages=llama_messages(query),
+        stream=True,
+        **params
+    ), openai_deltas):
+        chunks.append(delta)
+        yield delta
+
+    if cache:
+        llm_cache.put(LLAMA3_MODEL, params, query, "".join(chunks))
+
+async def astream_llama(query: str, params=llama_params, cache=False) -> AsyncIterator[str]:
+    if cache and (res := llm_cache.get(LLAMA3_MODEL, params, query)) is not None:
+        yield res
+        return
+
+    chunks = []
+    async for delta in clients.astream("llama", lambda: clients.async_client("llama").chat.completions.create(
+        model=LLAMA3_MODEL,
+        messages=llama_messages(query),
+        stream=True,
+        **params
+    ), aopenai_deltas):
+        chunks.append(delta)
+        yield delta
+
+    if cache:
+        llm_cache.put(LLAMA3_MODEL, params, query, "".join(chunks))
+
+def stream_claude(query: str, params=claude_params, cache=False) -> Iterator[str]:
+    if cache and (res := llm_cache.get(CLAUDE_MODEL, params, query)) is not None:
+        yield res
+        return
+
+    # create(stream=True) sends the request right away, so connection errors are retried
+    chunks = []
+    for delta in clients.stream("claude", lambda: clients.claude.messages.create(
+        model=CLAUDE_MODEL,
+        messages=llama_messages(query),
+        stream=True,
+        **params
+    ), anthropic_deltas):
+        chunks.append(delta)
+        yield delta
+
+    if cache:
+        llm_cache.put(CLAUDE_MODEL, params, query, "".join(chunks))
+
+async def astream_claude(query: str, params=claude_params, cache=False) -> AsyncIterator[str]:
+    if cache and (res := llm_cache.get(CLAUDE_MODEL, params, query)) is not None:
+        yield res
+        return
+
+    chunks = []
+    async for delta in clients.astream("claude", lambda: clients.async_client("claude").messages.create(
+        model=CLAUDE_MODEL,
+        messages=llama_messages(query),
+        stream=True,
+        **params
+    ), aanthropic_deltas):
+        chunks.append(delta)
+        yield delta
+
+    if cache:
+        llm_cache.put(CLAUDE_MODEL, params, query, "".join(chunks))
+
 if __name__ == "__main__":
     query = "Describe all possible combinations of rapamycin with other substances and its effent on longevity and aging processes. Return a succint answer in a bullted list"
     ret = query_llama(query)
@@ -53,4 +416,6 @@ if __name__ == "__main__":
 
     ret = query_claude(query)
     print("Claude output:")
-    print(ret)
\ No newline at end of file
+    print(ret)
+
+    print(clients.metrics())
@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+
+import numpy as np
+from loguru import logger
+
+import project_config
+from research_scripts.build_artifacts import record_build
+from research_scripts.triplet_store import get_triplet_store
+
+BLOB_FILE = "names.npy"
+OFFSETS_FILE = "offsets.npy"
+
+
+def short_name(name: str) -> str:
+    """Drop the type prefix: 'Disease::MESH:Aging' -> 'Aging'."""
+    return name.split(':')[-1]
+
+
+def compile_entity_name_table(store, table_dir=None, mapping=None):
+    """
+    Convert the entity name mapping into a table aligned with the entity IDs of the
+    triplet store: a UTF-8 blob of all names and the offsets of every name in it.
+    Entities without a mapping get an empty name. The mapping is read from
+    entity_name_mapping.json unless given.
+    """
+    if table_dir is None:
+        table_dir = project_config.PATH_ENTITY_NAME_TABLE
+    if mapping is None:
+        with open(project_config.PATH_ENTITY_NAME_MAPPING, "r") as f:
+            mapping = json.load(f)
+
+    encoded = [mapping.get(entity, "").encode("utf-8") for entity in store.entities]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(name) for name in encoded])
+
+    table_dir.mkdir(parents=True, exist_ok=True)
+    np.save(table_dir / BLOB_FILE, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(table_dir / OFFSETS_FILE, offsets)
+
+
+class EntityNames:
+    """
+    Process-wide entity key -> human-readable name lookup.
+    Names are kept in a memory-mapped table keyed by the same integer IDs as the
+    triplet store and the DrKG graph, loaded on first use.
+    """
+
+    def __init__(self, table_dir=None):
+        self.table_dir = table_dir or project_config.PATH_ENTITY_NAME_TABLE
+        self._lock = threading.Lock()
+        self._store = None
+        self._blob = None
+        self._offsets = None
+
+    def _load(self):
+        if self._offsets is not None:
+            return
+        with self._lock:
+            if self._offsets is not None:
+                return
+            start = time.time()
+            store = get_triplet_store()
+            offsets_path = self.table_dir / OFFSETS_FILE
+            # The table is rebuilt from the mapping JSON when missing or compiled for another
+            # version of the store, the mapping itself is only built offline by mapping_id
+            if not offsets_path.exists() or len(np.load(offsets_path, mmap_mode="r")) != len(store.entities) + 1:
+                if project_config.PATH_ENTITY_NAME_MAPPING.exists():
+                    compile_entity_name_table(store, self.table_dir)
+                    if self.table_dir == project_config.PATH_ENTITY_NAME_TABLE:
+                        record_build("entity_names", from_inputs=False)
+            self._store = store
+            if offsets_path.exists():
+                self._blob = np.load(self.table_dir / BLOB_FILE, mmap_mode="r")
+                self._offsets = np.load(offsets_path)
+            else:
+                logger.error(
+                    "Entity name mapping not found, showing DrKG keys instead of names. "
+                    "Build it with: python -m research_scripts.mapping_id"
+                )
+                self._blob = np.empty(0, dtype=np.uint8)
+                self._offsets = np.zeros(len(store.entities) + 1, dtype=np.int64)
+            logger.info(f"Loaded entity name table in {time.time() - start}s...")
+
+    def ensure_loaded(self):
+        """Load the table now, compiling it first if it is missing or out of date."""
+        self._load()
+
+    def __len__(self):
+        """Number of entities in the table, the same as in the triplet store."""
+        self._load()
+        return len(self._offsets) - 1
+
+    def _name(self, start, end) -> str:
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def map_ids(self, ids, short=False) -> list:
+        """
+        Names of N entity IDs at once. Every distinct ID is decoded once and the
+        names are gathered back with an integer index.
+        Entities without a mapping keep their DrKG key, short applies to mapped names only.
+        """
+        self._load()
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return []
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        starts = self._offsets[unique_ids].tolist()
+        ends = self._offsets[unique_ids + 1].tolist()
+        names = np.empty(len(unique_ids), dtype=object)
+        names[:] = [
+            (short_name(self._name(s, e)) if short else self._name(s, e)) if e > s else self._store.entities[i]
+            for i, s, e in zip(unique_ids.tolist(), starts, ends)
+        ]
+        return names[inverse].tolist()
+
+    def map_keys(self, keys, short=False) -> list:
+        """Names of N DrKG keys ('Gene::1234'), keys unknown to DrKG are returned as is."""
+        self._load()
+        index = self._store.entity_index
+        ids = [index.get(key, -1) for key in keys]
+        known = [i for i in ids if i >= 0]
+        names = iter(self.map_ids(known, short=short))
+        return [next(names) if i >= 0 else key for i, key in zip(ids, keys)]
+
+    def get(self, key, default=None, short=False):
+        """Dict-like lookup of a single key, default is returned if the key has no name."""
+        self._load()
+        i = self._store.entity_index.get(key)
+        if i is None or self._offsets[i + 1] == self._offsets[i]:
+            return default
+        name = self._name(self._offsets[i], self._offsets[i + 1])
+        return short_name(name) if short else name
+
+
+entity_names = EntityNames()
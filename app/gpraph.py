@@ -1,44 +1,128 @@
-import pandas as pd
-import project_config
-import json
+import argparse
+import itertools
 import time
 
-from research_scripts.find_id_compound import find_id_compound
-from research_scripts.get_actual_relations import get_actual_relations
-from research_scripts.loading_graph import build_igraph_from_triplets
+from research_scripts.find_id_compound import find_id_compound, get_drug_resolver
+from research_scripts.get_actual_relations import get_actual_relations, get_glossary_provider
+from research_scripts.loading_graph import build_drkg_graph
 from research_scripts.filtering_graph import filter_graph
-from research_scripts.mapping_id import create_entity_name_mapping
+from research_scripts.pruning_graph import prune_graph
+from research_scripts.path_search import describe_paths, find_paths
+from research_scripts.triplet_store import get_triplet_store
+from research_scripts.build_artifacts import check_manifest
+from app.entity_names import entity_names
+from app.subgraph_cache import subgraph_cache
+import project_config
 
 from loguru import logger
 
+check_manifest()
+
 start = time.time()
-triplets = pd.read_csv(project_config.PATH_DRKG, sep='\t', header=None).values.tolist()
-# graph = ig.read(project_config.PATH_GRAPH, format="gml")
+store = get_triplet_store()
+graph = build_drkg_graph(store)
 logger.info(f"Loaded graph in {time.time() - start}s...")
+get_drug_resolver()
+get_glossary_provider()
+
+# Relation-restricted views of the graph, one per set of allowed relations
+relation_graphs = {}
   
 
-def get_id_to_name_mapping():
-    """Load the entity name mapping from a JSON file."""
-    if not project_config.PATH_ENTITY_NAME_MAPPING.exists():
-        create_entity_name_mapping()
-        logger.debug("Entity name mapping created.")
-    
-    with open(project_config.PATH_ENTITY_NAME_MAPPING, "r") as f:
-        entity_name_mapping = json.load(f)
-    
-    return entity_name_mapping
+def get_relation_graph(relation_ids):
+    """
+    View of the full graph keeping only the edges of the given relations.
+    Vertex IDs are kept, so they still match the entity IDs of the store.
+    Built once per relation set, there are only a few glossary variants.
+    """
+    key = frozenset(relation_ids)
+    if key not in relation_graphs:
+        start = time.time()
+        relation_graphs[key] = graph.subgraph_edges(store.edges_for_relations(key), delete_vertices=False)
+        logger.info(f"Built relation view with {relation_graphs[key].ecount()} edges in {time.time() - start}s")
+    return relation_graphs[key]
+
+def build_subgraph(drug_ids, actual_relations):
+    relation_ids = store.relation_ids(actual_relations)
+    relation_graph = get_relation_graph(relation_ids)
+    filt_graph = filter_graph(
+        relation_graph,
+        store.entity_ids(drug_ids),
+        hops=project_config.FILTER_GRAPH_HOPS,
+        max_degree=project_config.FILTER_GRAPH_MAX_DEGREE,
+    )
+
+    # Vertex names stay DrKG keys, readable names go to the label
+    filt_graph.vs['label'] = entity_names.map_keys(filt_graph.vs['name'])
+    return filt_graph
 
 def run_subgraph_builder(drugs):
-    global triplets
     drug_ids = find_id_compound(drugs)
     
     logger.debug(f"Creating graph for the drugs: {', '.join(drugs)} with IDs: {', '.join(drug_ids)}")
     actual_relations = get_actual_relations(drug_ids)
-    actual_triplets = [triplet for triplet in triplets if triplet[1] in actual_relations]
-    
-    graph = build_igraph_from_triplets(actual_triplets)
-    filt_graph = filter_graph(graph, drug_ids)
 
-    filt_graph.vs['name'] = [get_id_to_name_mapping().get(name, name) for name in filt_graph.vs['name']]
+    filt_graph = subgraph_cache.get(drug_ids, actual_relations)
+    if filt_graph is None:
+        filt_graph = build_subgraph(drug_ids, actual_relations)
+        subgraph_cache.put(drug_ids, actual_relations, filt_graph)
+    else:
+        logger.debug(f"Subgraph for {', '.join(drug_ids)} served from cache")
     
     return filt_graph, list(drug_ids)
+
+def prune_subgraph(subgraph, drug_ids, max_per_type):
+    """
+    Top ranked part of a drug subgraph, see prune_graph.
+    Returns the pruned graph and the {entity ID: score} ranking of its vertices.
+    """
+    start = time.time()
+    pruned = prune_graph(subgraph, drug_ids, max_per_type)
+    ranking = dict(zip(store.entity_ids(pruned.vs['name']), pruned.vs['score']))
+    logger.debug(f"Pruned subgraph from {subgraph.vcount()} to {pruned.vcount()} vertices in {time.time() - start}s")
+    return pruned, ranking
+
+def run_path_search(drug_ids):
+    """
+    Shortest connections between every pair of the drugs over the relations of the glossary,
+    one line of text per path. Pairs take turns, so a trimmed list still covers every pair.
+    """
+    start = time.time()
+    relation_graph = get_relation_graph(store.relation_ids(get_actual_relations(drug_ids)))
+    ids = store.entity_ids(drug_ids)
+    pair_paths = [
+        find_paths(
+            relation_graph,
+            [source],
+            [target],
+            max_hops=project_config.PATH_SEARCH_MAX_HOPS,
+            k=project_config.PATH_SEARCH_K,
+            max_degree=project_config.FILTER_GRAPH_MAX_DEGREE,
+        )
+        for source, target in itertools.combinations(ids, 2)
+    ]
+    paths = [path for turn in itertools.zip_longest(*pair_paths) for path in turn if path is not None]
+
+    vertices = sorted({v for path in paths for v in path})
+    labels = dict(zip(vertices, entity_names.map_ids(vertices, short=True)))
+    lines = describe_paths(relation_graph, paths, labels)
+    logger.debug(f"Found {len(paths)} paths between {', '.join(drug_ids)} in {time.time() - start}s")
+    return lines
+
+def warm_up(compounds, pairs=False):
+    """Precompute the subgraphs of the given compounds, and of all their pairs if requested."""
+    drug_sets = [[compound] for compound in compounds]
+    if pairs:
+        drug_sets += [list(pair) for pair in itertools.combinations(compounds, 2)]
+    for drugs in drug_sets:
+        start = time.time()
+        subgraph, drug_ids = run_subgraph_builder(drugs)
+        logger.info(f"Warmed up {', '.join(drugs)}: {subgraph.vcount()} vertices in {time.time() - start}s")
+    logger.info(f"Subgraph cache: {subgraph_cache.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute subgraphs of popular compounds")
+    parser.add_argument("--top", type=int, default=project_config.SUBGRAPH_WARMUP_TOP_N)
+    parser.add_argument("--pairs", action="store_true", help="also precompute every pair of the compounds")
+    args = parser.parse_args()
+    warm_up(project_config.SUBGRAPH_WARMUP_COMPOUNDS[:args.top], pairs=args.pairs)
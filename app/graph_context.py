@@ -0,0 +1,169 @@
+import re
+import threading
+
+from loguru import logger
+
+# The served Llama 3 tokenizer extends the cl100k vocabulary, so cl100k counts are close
+# to the real ones and rather above them, the safe side for a budget
+try:
+    import tiktoken
+    encoding = tiktoken.get_encoding("cl100k_base")
+except Exception as e:
+    logger.warning(f"tiktoken encoding not available ({e}), graph context tokens are estimated")
+    encoding = None
+
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Short labels of the create_json_for_llm relation aliases
+SHORT_ALIASES = {
+    'disease_associated_with_drug': 'associated diseases',
+    'disease_cured_by_drug': 'treats diseases',
+    'genes_inhibited_or_suppressed_by_drug': 'inhibits genes',
+    'genes_enhanced_or_activated_by_drug': 'activates genes',
+    'side_effects_assosiated_with_drug': 'side effects',
+    'gene_pathways_activated_by_drug': 'activates pathways',
+    'gene_pathways_inhibited_by_drug': 'inhibits pathways',
+    'molecular_function_activated_by_drug': 'activates functions',
+    'molecular_function_inhibited_by_drug': 'inhibits functions',
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count with tiktoken. Without it, an overestimate: a token per punctuation mark
+    and per started 4 characters of a word, names and IDs split into many short tokens.
+    """
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return sum((len(word) + 3) // 4 for word in WORD_PATTERN.findall(text))
+
+
+def render_list(items, limit) -> str:
+    if limit is not None and len(items) > limit:
+        return "; ".join(items[:limit]) + f" (+{len(items) - limit} more)"
+    return "; ".join(items)
+
+
+def group_by_relation(graph_json: dict) -> list:
+    """
+    [(relation label, shared items, {compound: own items})], item lists deduplicated in rank order.
+    With several compounds, items listed for all of them are moved to the shared list.
+    """
+    groups = []
+    for relation, cells in graph_json.items():
+        cells = {compound: list(dict.fromkeys(items)) for compound, items in cells.items() if len(items)}
+        if not cells:
+            continue
+        shared = []
+        if len(cells) > 1:
+            common = set.intersection(*(set(items) for items in cells.values()))
+            shared = [item for item in next(iter(cells.values())) if item in common]
+            cells = {compound: [item for item in items if item not in common] for compound, items in cells.items()}
+        groups.append((SHORT_ALIASES.get(relation, relation.replace('_', ' ')), shared, cells))
+    return groups
+
+
+def render(groups, limit) -> str:
+    lines = []
+    for relation, shared, cells in groups:
+        lines.append(f"{relation}:")
+        if shared:
+            lines.append(f"  all: {render_list(shared, limit)}")
+        for compound, items in cells.items():
+            if items:
+                lines.append(f"  {compound}: {render_list(items, limit)}")
+    return "\n".join(lines)
+
+
+class ContextMetrics:
+    """Running totals of graph context sizes, before and after compaction."""
+
+    def __init__(self):
+        self.requests = 0
+        self.raw_tokens = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, raw_tokens: int, tokens: int):
+        with self._lock:
+            self.requests += 1
+            self.raw_tokens += raw_tokens
+            self.tokens += tokens
+
+    def summary(self) -> dict:
+        return {
+            "requests": self.requests,
+            "raw_tokens": self.raw_tokens,
+            "tokens": self.tokens,
+            "tokens_saved": self.raw_tokens - self.tokens,
+        }
+
+
+context_metrics = ContextMetrics()
+
+
+def fit_lists(groups, token_budget):
+    """Text of the groups with every list cut to the largest length within token_budget, None if none fits."""
+    longest = max((len(items) for _, shared, cells in groups for items in [shared, *cells.values()]), default=0)
+    if estimate_tokens(render(groups, 0)) > token_budget:
+        return None
+    low, high = 0, longest
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(render(groups, middle)) <= token_budget:
+            low = middle
+        else:
+            high = middle - 1
+    return render(groups, low)
+
+
+def fit_groups(groups, token_budget) -> str:
+    """Text of the groups within token_budget: lists cut first, then whole blocks dropped from the end."""
+    text = render(groups, None)
+    if estimate_tokens(text) > token_budget:
+        text = fit_lists(groups, token_budget)
+        while text is None:
+            groups = groups[:-1]
+            text = fit_lists(groups, token_budget) if groups else ""
+    return text
+
+
+def fit_section(title, lines, token_budget) -> str:
+    """'title:' and the leading lines that fit in token_budget, lines are ranked best first."""
+    kept = []
+    for line in lines:
+        if estimate_tokens("\n".join([f"{title}:", *kept, line])) > token_budget:
+            break
+        kept.append(line)
+    return "\n".join([f"{title}:", *kept]) if kept else ""
+
+
+def serialize_graph_context(graph_json: dict, token_budget: int, sections=()) -> str:
+    """
+    Compact text form of the create_json_for_llm output for the prompt: one block per
+    relation with short labels, duplicates removed and items shared by all compounds
+    listed once. If the text exceeds token_budget, every list is cut to the largest
+    length that fits. Lists are ranked, so the least important items go first. If even
+    empty lists do not fit, whole relation blocks are dropped from the end.
+    sections are (title, ranked lines) blocks appended after the relations, such as the
+    paths between the compounds. Together they take at most half of the budget, split
+    evenly, and are cut to their best lines. The result never exceeds token_budget.
+    """
+    section_budget = token_budget // (2 * len(sections)) if sections else 0
+    section_texts = [text for title, lines in sections if (text := fit_section(title, lines, section_budget))]
+
+    groups = group_by_relation(graph_json)
+    graph_budget = token_budget - estimate_tokens("\n".join(section_texts))
+    while True:
+        text = "\n".join([t for t in [fit_groups(groups, max(graph_budget, 0)), *section_texts] if t])
+        # Joining the blocks can merge tokens differently, shrink the relations by the excess
+        excess = estimate_tokens(text) - token_budget
+        if excess <= 0 or graph_budget <= 0:
+            break
+        graph_budget -= excess
+
+    raw_tokens = estimate_tokens(str(graph_json)) + sum(estimate_tokens("\n".join(lines)) for _, lines in sections)
+    tokens = estimate_tokens(text)
+    context_metrics.record(raw_tokens, tokens)
+    logger.info(f"Graph context: {tokens} tokens instead of {raw_tokens} ({raw_tokens - tokens} saved, budget {token_budget})")
+    return text
@@ -0,0 +1,108 @@
+import csv
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from loguru import logger
+
+import project_config
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Keyword cues of each task, added as extra features so TF-IDF learns their weight
+TASK_CUES = {
+    "compare": r"\b(compar\w*|vs|versus|differ\w*|better than|more effective|which is better|which works better|pros and cons)\b",
+    "combinations": r"\b(combin\w*|together|compatible|stack|synerg\w*|pair\w*|interact\w*|with other)\b",
+    "single": r"\b(tell me about|describe|what does|what is known|mechanism|information about|effects? of|side effects)\b",
+    "tested": r"\b(tested|test|mice|mouse|rats?|species|clinical|trials?|studied|study|flies|worms|elegans|dogs|primates|humans)\b",
+    "suggest": r"\b(suggest|recommend|best|top|list of|promising|what should i take|live longer|longer)\b",
+    "help": r"\b(help|use this|what can you|features|instructions|how does this work|this (app|system|tool)|tasks)\b",
+}
+TASK_CUES = {label: re.compile(cue) for label, cue in TASK_CUES.items()}
+CUE_WEIGHT = 2
+
+
+def query_features(query: str) -> List[str]:
+    """Word unigrams and bigrams of a query plus its task keyword cues."""
+    query = query.lower()
+    tokens = TOKEN_RE.findall(query)
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for label, cue in TASK_CUES.items():
+        if cue.search(query):
+            features += [f"cue:{label}"] * CUE_WEIGHT
+    return features
+
+
+class IntentClassifier:
+    """
+    CPU-only task classifier: TF-IDF vectors of the labelled queries and the
+    nearest label centroid by cosine similarity. A prediction is confident when
+    both the similarity and its margin over the runner-up label clear the thresholds.
+    """
+
+    def __init__(self, min_score=None, min_margin=None):
+        self.min_score = project_config.INTENT_MIN_SCORE if min_score is None else min_score
+        self.min_margin = project_config.INTENT_MIN_MARGIN if min_margin is None else min_margin
+        self.idf = {}
+        self.centroids = {}
+
+    def _vector(self, features) -> dict:
+        counts = Counter(f for f in features if f in self.idf)
+        vector = {f: (1 + math.log(c)) * self.idf[f] for f, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {f: v / norm for f, v in vector.items()} if norm else {}
+
+    def fit(self, queries: List[str], labels: List[str]) -> "IntentClassifier":
+        documents = [query_features(q) for q in queries]
+        df = Counter(f for features in documents for f in set(features))
+        self.idf = {f: math.log((1 + len(documents)) / (1 + n)) + 1 for f, n in df.items()}
+
+        sums = defaultdict(Counter)
+        for features, label in zip(documents, labels):
+            sums[label].update(self._vector(features))
+        self.centroids = {}
+        for label, total in sums.items():
+            norm = math.sqrt(sum(v * v for v in total.values()))
+            self.centroids[label] = {f: v / norm for f, v in total.items()}
+        return self
+
+    def scores(self, query: str) -> List[Tuple[str, float]]:
+        """Cosine similarity to every label centroid, best first."""
+        vector = self._vector(query_features(query))
+        scores = [
+            (label, sum(v * centroid.get(f, 0.0) for f, v in vector.items()))
+            for label, centroid in self.centroids.items()
+        ]
+        return sorted(scores, key=lambda x: x[1], reverse=True)
+
+    def predict(self, query: str) -> Tuple[str, float, bool]:
+        """Returns (label, score, confident)."""
+        scores = self.scores(query)
+        label, score = scores[0]
+        runner_up = scores[1][1] if len(scores) > 1 else 0.0
+        confident = score >= self.min_score and score - runner_up >= self.min_margin
+        return label, score, confident
+
+    def classify(self, query: str) -> Optional[str]:
+        """Label if the prediction is confident, None if the caller should fall back to the LLM."""
+        label, score, confident = self.predict(query)
+        logger.debug(f"Local intent: {query} -> {label} ({score:.2f}, confident={confident})")
+        return label if confident else None
+
+
+def load_labelled_queries(path=None) -> Tuple[List[str], List[str]]:
+    if path is None:
+        path = project_config.PATH_INTENT_DATASET
+    with open(path, "r", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f, delimiter="\t"))
+    return [row["query"] for row in rows], [row["label"] for row in rows]
+
+
+@lru_cache(maxsize=None)
+def get_intent_classifier() -> IntentClassifier:
+    """Process-wide classifier trained on the labelled query dataset."""
+    queries, labels = load_labelled_queries()
+    logger.info(f"Training intent classifier on {len(queries)} labelled queries")
+    return IntentClassifier().fit(queries, labels)
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from loguru import logger
+
+import project_config
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case and whitespace do not change the answer, so they do not change the key either."""
+    return " ".join(prompt.lower().split())
+
+
+def make_key(model: str, params: dict, prompt: str) -> str:
+    payload = json.dumps(
+        {"model": model, "params": params, "prompt": normalize_prompt(prompt)},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of LLM responses keyed on (model, params, prompt hash).
+    Entries older than max_age seconds are dropped, and the least recently used
+    entries are evicted once there are more than max_entries.
+    """
+
+    def __init__(self, path=None, max_entries=None, max_age=None):
+        self.path = path or project_config.PATH_LLM_CACHE
+        self.max_entries = max_entries or project_config.LLM_CACHE_MAX_ENTRIES
+        self.max_age = max_age or project_config.LLM_CACHE_MAX_AGE
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, accessed REAL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._connection.commit()
+        return self._connection
+
+    def get(self, model: str, params: dict, prompt: str) -> Optional[str]:
+        key = make_key(model, params, prompt)
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.hits += 1
+        logger.debug(f"LLM cache hit for {model}")
+        return row[0]
+
+    def put(self, model: str, params: dict, prompt: str, response: str) -> None:
+        key = make_key(model, params, prompt)
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            self._evict(now)
+            self.connection.commit()
+
+    def _evict(self, now: float) -> None:
+        self.connection.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age,))
+        self.connection.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+llm_cache = LLMCache()
@@ -1,15 +1,26 @@
 #!/usr/bin/env python3
 
+import asyncio
 import csv
 import json
 from loguru import logger
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
-from app.clients import query_llama
+import project_config
+
+from app.clients import aquery_llama, astream_llama, clients, query_llama
+from app.intent_classifier import get_intent_classifier
+from app.substance_matcher import SubstanceMatcher
 from app.prompts import DETERMINE_TASK_PROMPT, GENERAL_PROMPT, \
-        DENY_PROMPT, TASKS, GRAPH_NEEDED, FIND_SUBSTANCES_PROMPT, GRAPH_PROMPT
-from app.gpraph import run_subgraph_builder
+        DENY_PROMPT, TASKS, GRAPH_NEEDED, FIND_SUBSTANCES_PROMPT, GRAPH_PROMPT, \
+        TASK_GRAPH_LIMITS, DEFAULT_GRAPH_LIMITS, PATH_TASKS, SIMILARITY_TASKS, SIMILAR_PROMPT
+from app.entity_names import entity_names
+from app.graph_context import serialize_graph_context
+from app.gpraph import prune_subgraph, run_path_search, run_subgraph_builder
 from app.substance_mapper import create_json_for_llm
+from research_scripts.drug_similarity import get_drug_similarity
+from research_scripts.find_id_compound import find_id_compound
+from research_scripts.triplet_store import get_triplet_store
 
 entities_file = "data/entity_name_mapping.json"
 substances_file = "data/drugbank/drugbank_vocabulary.csv"
@@ -38,16 +49,18 @@ def load_substances():
 # initialize with cached lists of tokens
 substances = load_substances()
 substances_dict = {v: k for k, v in substances.items()}
+substance_matcher = SubstanceMatcher(substances.keys())
 signal_paths = None
+get_intent_classifier()
+get_drug_similarity()
 
 
 def find_substances(query: str) -> List[str]:
-    """Deprecated"""
-    ret = []
-    for substance in substances.keys():
-        if substance in query.lower():
-            ret.append(substances[substance])
-    return ret
+    """
+        Find vocabulary substance names in the query with the Aho-Corasick matcher.
+        Names are matched on word boundaries, overlapping names resolve to the longest one.
+    """
+    return substance_matcher.find(query)
 
 def return_substances_id_from_list(substances_list: List[str]) -> List[str]:
     """
@@ -74,7 +87,7 @@ def find_substances_llm(query: str) -> List[str]:
         Use LLM to find substances in the query.
         This is a fallback method if the substances are not found in the local vocabulary.
     """
-    response = query_llama(f"{FIND_SUBSTANCES_PROMPT}\nQuery: {query}", params=llama_params_det)
+    response = query_llama(f"{FIND_SUBSTANCES_PROMPT}\nQuery: {query}", params=llama_params_det, cache=True)
     ret_substances = list()
     substances_found = response.split(",")
     
@@ -82,23 +95,134 @@ def find_substances_llm(query: str) -> List[str]:
         ret_substances.append(substance.lower().strip())
     return ret_substances if response else []
 
-def determine_task(query: str) -> str:
-    # For production purposes, BERT should be fine-tuned here
+async def afind_substances_llm(query: str) -> List[str]:
+    """
+        Async version of find_substances_llm.
+    """
+    response = await aquery_llama(f"{FIND_SUBSTANCES_PROMPT}\nQuery: {query}", params=llama_params_det, cache=True)
+    return [substance.lower().strip() for substance in response.split(",")] if response else []
+
+def filter_known_substances(substances: List[str]) -> List[str]:
+    """
+        Keep only the substances present in the local vocabulary.
+    """
+    known = []
+    for substance in substances:
+        if check_substance_in_vocabulary(substance):
+            known.append(substance)
+        else:
+            logger.warning(f"Substance {substance} not found in the vocabulary.")
+    return known
+
+def task_prompt(query: str) -> str:
     tasks = "\n".join([f"{k}:{v}" for k, v in TASKS.items()])
-    prompt = f"{DETERMINE_TASK_PROMPT}\n\n{tasks}\nQuery:{query}"
-    res = query_llama(prompt, params=llama_params_det)
+    return f"{DETERMINE_TASK_PROMPT}\n\n{tasks}\nQuery:{query}"
+
+def determine_task(query: str) -> str:
+    """
+        Local classifier first, the LLM decides only when it is not confident.
+    """
+    if (res := get_intent_classifier().classify(query)) is not None:
+        return res
+    res = query_llama(task_prompt(query), params=llama_params_det, cache=True)
     return res
 
+async def adetermine_task(query: str) -> str:
+    if (res := get_intent_classifier().classify(query)) is not None:
+        return res
+    res = await aquery_llama(task_prompt(query), params=llama_params_det, cache=True)
+    return res
 
-def process_pipeline(query: str, history: List[str]=[], graph: Optional[object]=None) -> dict:
+
+async def extract_substances(query: str) -> List[str]:
+    """
+        Known substances of the query.
+        The vocabulary matcher is tried first, the LLM only if it finds nothing.
+    """
+    substances = find_substances(query)
+    if len(substances) == 0:
+        logger.info("No substances matched in the vocabulary, asking LLM...")
+        substances = filter_known_substances(await afind_substances_llm(query))
+    logger.info(f"Found substances in query: {substances}")
+    return substances
+
+
+def similar_substances(substance_ids: List[str], k: int=10) -> List[str]:
+    """
+        Compounds most similar to the given ones by shared genes, diseases and pathways,
+        one line each, best first, from the precomputed similarity index.
+    """
+    similar = get_drug_similarity().similar(get_triplet_store().entity_ids(substance_ids), k=k)
+    if not similar:
+        return []
+    names = entity_names.map_ids([drug_id for drug_id, _, _ in similar], short=True)
+    return [
+        f"{name} (similarity {score:.2f}, {shared} shared genes, diseases and pathways)"
+        for name, (_, score, shared) in zip(names, similar)
+    ]
+
+
+async def build_graph_context(substances_task: asyncio.Task, task_task: asyncio.Task) -> Optional[dict]:
+    """
+        Build the subgraph and pivot JSON of the substances once they are extracted.
+        Graph building runs in a worker thread so it overlaps with the other LLM calls,
+        the graph is then pruned to the limits of the task. Tasks relating several substances
+        also get the paths connecting them.
+        Returns None if no known substance was found.
+    """
+    substances = await substances_task
+    if len(substances) == 0:
+        return None
+
+    logger.info(f"Try to find {substances} in the DrugBank vocabulary and bulding a graph")
+    graph, substance_ids = await asyncio.to_thread(run_subgraph_builder, substances)
+    logger.info(f"Subgraph built with {len(graph.vs)} vertices and {len(graph.es)} edges.")
+    task = await task_task
+    limits = TASK_GRAPH_LIMITS.get(task, DEFAULT_GRAPH_LIMITS)
+    paths = None
+    if task in PATH_TASKS and len(substance_ids) > 1:
+        paths = asyncio.create_task(asyncio.to_thread(run_path_search, substance_ids))
+    graph, ranking = await asyncio.to_thread(prune_subgraph, graph, substance_ids, limits['nodes_per_type'])
+    supplemental_json = await asyncio.to_thread(
+        create_json_for_llm, substance_ids, ranking=ranking, max_per_cell=limits['values_per_cell']
+    )
+    # Extra blocks share the token budget of the graph context
+    sections = []
+    if paths is not None:
+        sections.append(("connections between the substances", await paths))
+    if task in SIMILARITY_TASKS:
+        sections.append(("similar compounds", await asyncio.to_thread(similar_substances, substance_ids)))
+    graph_prompt = serialize_graph_context(supplemental_json, limits['context_tokens'], sections)
+    return {
+        'substances': substances,
+        'graph': graph,
+        'substance_ids': substance_ids,
+        'json': supplemental_json,
+        'context': graph_prompt,
+    }
+
+
+async def astream_pipeline(query: str, history: List[str]=[], graph: Optional[object]=None) -> AsyncIterator[dict]:
     """
-        Handle next step of the dialogue
+        Handle next step of the dialogue, yielding stage events as soon as they are ready:
+        {'type': 'task'}, {'type': 'substances'}, {'type': 'graph'}, {'type': 'delta', 'text': ...}
+        for every chunk of the answer, and finally {'type': 'done', 'response': ...}.
+        Task classification and substance extraction run concurrently, the graph
+        is built as soon as the substances are known and dropped if the task does not need it.
     """
     
     response = {'text': '', 'graph': graph, 'history': history}
     logger.debug(f"Query received: {query}")
-    discovered_class = determine_task(query)
+    substances_task = asyncio.create_task(extract_substances(query))
+    task_task = asyncio.create_task(adetermine_task(query))
+    graph_context = asyncio.create_task(build_graph_context(substances_task, task_task))
+    discovered_class = await task_task
     logger.info(f"Query: {query} -> {discovered_class}")
+    yield {'type': 'task', 'task': discovered_class}
+    if discovered_class not in GRAPH_NEEDED:
+        graph_context.cancel()
+        substances_task.cancel()
+
     prompt = f"{DENY_PROMPT}\n\nTask: {query}"
     if discovered_class in TASKS.keys():
         
@@ -107,34 +231,54 @@ def process_pipeline(query: str, history: List[str]=[], graph: Optional[object]=
             
         elif discovered_class in GRAPH_NEEDED:
             prompt = f"{GENERAL_PROMPT}\n\n{TASKS[discovered_class]}\nTask: {query}"
-            # Prepare the graph if needed
-            substances = find_substances_llm(query)
-            logger.info(f"Found substances in query: {substances}")
-            for substance in substances:
-                if not check_substance_in_vocabulary(substance):
-                    logger.warning(f"Substance {substance} not found in the vocabulary. Trying to find it with LLM...")
-                    substances.remove(substance)
+            yield {'type': 'substances', 'substances': await substances_task}
+            context = await graph_context
             
-            if len(substances) == 0:
+            if context is None:
                 prompt = f"Please provide a query that contains at least one substance from the DrugBank vocabulary."
             else:
-                logger.info(f"Found substances by LLM: {substances}. Try to find in the DrugBank vocabulary and bulding a graph")
-                response['graph'], substance_ids = run_subgraph_builder(substances)
-                logger.info(f"Subgraph built with {len(response['graph'].vs)} vertices and {len(response['graph'].es)} edges.")
-                supplemental_json = create_json_for_llm(substance_ids)
+                response['graph'] = context['graph']
+                yield {'type': 'graph', 'graph': context['graph']}
+                supplemental_json = context['json']
                 # logger.debug(json.dumps(supplemental_json, indent=4))
                 if supplemental_json and len(supplemental_json) > 2:
-                    prompt = f"{GENERAL_PROMPT}\n\n{TASKS[discovered_class]}\n{GRAPH_PROMPT}\n{supplemental_json}\nTask: {query}"
+                    prompt = f"{GENERAL_PROMPT}\n\n{TASKS[discovered_class]}\n{GRAPH_PROMPT}\n{context['context']}\nTask: {query}"
 
         else:
             prompt = f"{GENERAL_PROMPT}\n\n{TASKS[discovered_class]}\nQuery: {query}"
+            # Suggestions only use the vocabulary matcher, not worth an LLM extraction round trip
+            if discovered_class in SIMILARITY_TASKS and (substances := find_substances(query)):
+                yield {'type': 'substances', 'substances': substances}
+                similar = await asyncio.to_thread(lambda: similar_substances(find_id_compound(substances)))
+                if similar:
+                    prompt = f"{GENERAL_PROMPT}\n\n{TASKS[discovered_class]}\n{SIMILAR_PROMPT}\n" + "\n".join(similar) + f"\nQuery: {query}"
 
     # logger.debug(response['graph'])
-    response['text'] = query_llama(prompt)
     logger.debug(f"Query to LLM: {prompt}")
+    chunks = []
+    async for delta in astream_llama(prompt, cache=project_config.LLM_CACHE_FINAL_ANSWER):
+        chunks.append(delta)
+        yield {'type': 'delta', 'text': delta}
+    response['text'] = "".join(chunks)
     logger.debug(f"LLM response: {response['text']}")
     logger.info(f"Sending response: {response['text'][:120]}...")
-    return response
+    yield {'type': 'done', 'response': response}
+
+
+async def aprocess_pipeline(query: str, history: List[str]=[], graph: Optional[object]=None) -> dict:
+    """
+        Handle next step of the dialogue and return the complete response
+    """
+    async for event in astream_pipeline(query, history, graph):
+        if event['type'] == 'done':
+            return event['response']
+
+
+def process_pipeline(query: str, history: List[str]=[], graph: Optional[object]=None) -> dict:
+    """
+        Handle next step of the dialogue (blocking wrapper around aprocess_pipeline)
+    """
+    return clients.run(aprocess_pipeline(query, history, graph))
 
 
 if __name__ == "__main__":
@@ -152,7 +296,7 @@ if __name__ == "__main__":
         print(f"Task: {task} -> {discovered_class}")
 
     res = find_substances(tasks[1])
-    print(f"Sent: {tasks[1]} -> {res} ({[substances_dict[r] for r in res]})")
+    print(f"Sent: {tasks[1]} -> {res} ({[substances[r] for r in res]})")
 
     res = find_substances("Hello")
-    print(f"Sent: Hello -> {res} ({[substances_dict[r] for r in res]})")
+    print(f"Sent: Hello -> {res} ({[substances[r] for r in res]})")
@@ -0,0 +1,144 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+import project_config
+from research_scripts.build_artifacts import record_build
+from research_scripts.triplet_store import get_triplet_store
+
+COMPOUNDS_FILE = "compounds.json"
+COLUMNS_FILE = "columns.json"
+EXTRA_VALUES_FILE = "extra_values.json"
+PRESENT_FILE = "present.npy"
+OFFSETS_FILE = "offsets.npy"
+VALUES_FILE = "values.npy"
+
+
+class DrugPivotStore:
+    """
+    Drug pivot (compound x relation column -> list of entities) in an offset-indexed
+    columnar layout. Cell (r, c) holds values[offsets[r * n_columns + c]:offsets[r * n_columns + c + 1]],
+    present[r, c] is False where the pivot had NaN. Values are triplet store entity IDs,
+    entities unknown to DrKG are numbered after them and kept in extra_values.
+    Arrays are memory-mapped, so only the rows of requested compounds are read.
+    """
+
+    def __init__(self, compounds, columns, extra_values, present, offsets, values):
+        self.compounds = compounds
+        self.columns = columns
+        self.extra_values = extra_values
+        self.present = present
+        self.offsets = offsets
+        self.values = values
+        self.compound_index = {compound: i for i, compound in enumerate(compounds)}
+
+    def cell_ids(self, compounds, columns=None) -> dict:
+        """
+        {column: {compound: entity IDs}} for the requested compounds, skipping NaN cells.
+        Compounds missing from the pivot are skipped with a warning.
+        """
+        rows = []
+        for compound in compounds:
+            if compound in self.compound_index:
+                rows.append((compound, self.compound_index[compound]))
+            else:
+                logger.warning(f"Compound {compound} not found in the drug pivot.")
+
+        n_columns = len(self.columns)
+        cells = {}
+        for c, column in enumerate(self.columns):
+            if columns is not None and column not in columns:
+                continue
+            for compound, r in rows:
+                if not self.present[r, c]:
+                    continue
+                k = r * n_columns + c
+                cells.setdefault(column, {})[compound] = self.values[self.offsets[k]:self.offsets[k + 1]]
+        return cells
+
+    def value_names(self, ids) -> list:
+        """DrKG keys of the given value IDs."""
+        entities = get_triplet_store().entities
+        n = len(entities)
+        return [entities[i] if i < n else self.extra_values[i - n] for i in np.asarray(ids).tolist()]
+
+
+def compile_pivot_store(path_pivot=None, store_dir=None):
+    """One-time conversion of the drug pivot JSON (orient="table") into the columnar store."""
+    if path_pivot is None:
+        path_pivot = project_config.PATH_DRUG_PIVOT
+    if store_dir is None:
+        store_dir = project_config.PATH_DRUG_PIVOT_STORE
+
+    start = time.time()
+    drug_pivot = pd.read_json(path_pivot, orient="table").set_index("compound")
+    entity_index = get_triplet_store().entity_index
+    n_entities = len(entity_index)
+
+    extra_values = {}
+    present = np.zeros(drug_pivot.shape, dtype=bool)
+    offsets = [0]
+    values = []
+    for r, row in enumerate(drug_pivot.itertuples(index=False)):
+        for c, cell in enumerate(row):
+            if isinstance(cell, (list, np.ndarray)):
+                items = cell
+            elif cell is None or pd.isna(cell):
+                items = []
+            else:
+                items = [cell]
+            present[r, c] = isinstance(cell, (list, np.ndarray)) or len(items) > 0
+            for item in items:
+                if item in entity_index:
+                    values.append(entity_index[item])
+                else:
+                    values.append(extra_values.setdefault(item, n_entities + len(extra_values)))
+            offsets.append(len(values))
+
+    store_dir.mkdir(parents=True, exist_ok=True)
+    with open(store_dir / COMPOUNDS_FILE, "w") as f:
+        json.dump(drug_pivot.index.tolist(), f)
+    with open(store_dir / COLUMNS_FILE, "w") as f:
+        json.dump(drug_pivot.columns.tolist(), f)
+    with open(store_dir / EXTRA_VALUES_FILE, "w") as f:
+        json.dump(list(extra_values.keys()), f)
+    np.save(store_dir / PRESENT_FILE, present)
+    np.save(store_dir / OFFSETS_FILE, np.asarray(offsets, dtype=np.int64))
+    np.save(store_dir / VALUES_FILE, np.asarray(values, dtype=np.int32))
+
+    logger.info(f"Compiled drug pivot store with {len(drug_pivot)} compounds and {len(values)} values in {time.time() - start}s")
+
+
+def load_pivot_store(store_dir=None) -> DrugPivotStore:
+    """Memory-map the drug pivot store, compiling it from the pivot JSON first if it is missing."""
+    if store_dir is None:
+        store_dir = project_config.PATH_DRUG_PIVOT_STORE
+
+    if not (store_dir / VALUES_FILE).exists():
+        logger.info(f"Drug pivot store not found in {store_dir}, compiling it from JSON...")
+        compile_pivot_store(store_dir=store_dir)
+        if store_dir == project_config.PATH_DRUG_PIVOT_STORE:
+            record_build("drug_pivot_store")
+
+    with open(store_dir / COMPOUNDS_FILE, "r") as f:
+        compounds = json.load(f)
+    with open(store_dir / COLUMNS_FILE, "r") as f:
+        columns = json.load(f)
+    with open(store_dir / EXTRA_VALUES_FILE, "r") as f:
+        extra_values = json.load(f)
+
+    return DrugPivotStore(
+        compounds=compounds,
+        columns=columns,
+        extra_values=extra_values,
+        present=np.load(store_dir / PRESENT_FILE, mmap_mode="r"),
+        offsets=np.load(store_dir / OFFSETS_FILE, mmap_mode="r"),
+        values=np.load(store_dir / VALUES_FILE, mmap_mode="r"),
+    )
+
+
+if __name__ == "__main__":
+    compile_pivot_store()
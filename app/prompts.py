@@ -38,6 +38,26 @@ GRAPH_NEEDED = [
     "single"
 ]
 
+# Size of the graph context per task: best ranked vertices kept per node type (graph shown
+# in the UI), entities listed per relation of a substance, and tokens of the context in the prompt
+TASK_GRAPH_LIMITS = {
+    "compare": {"nodes_per_type": 25, "values_per_cell": 15, "context_tokens": 1500},
+    "combinations": {"nodes_per_type": 30, "values_per_cell": 15, "context_tokens": 1500},
+    "single": {"nodes_per_type": 40, "values_per_cell": 25, "context_tokens": 1200},
+}
+# Tasks whose graph context also lists the shortest connections between the substances
+PATH_TASKS = [
+    "compare",
+    "combinations"
+]
+# Tasks grounded in the compounds most similar to the substances of the query
+SIMILARITY_TASKS = [
+    "suggest",
+    "combinations"
+]
+SIMILAR_PROMPT = "Compounds below share the most genes, diseases and pathways with the substances of the query in a knowledge graph. Prefer them in the response where they fit the task"
+DEFAULT_GRAPH_LIMITS = {"nodes_per_type": 25, "values_per_cell": 15, "context_tokens": 1200}
+
 DETERMINE_TASK_PROMPT = "Check if the query provided belongs to one of the following task, or return WRONGTASK if the query belongs to none of them. Return only the label of the task."
 
 GENERAL_PROMPT = "Here is the task and the query with respect to the task of longevity. Respond to the task as precise as possible. Return the response in a few sentences."
@@ -46,4 +66,4 @@ DENY_PROMPT = "Return a polite denial to perform the task requested because the
 FIND_SUBSTANCES_PROMPT = """Find any substances in the query below.
 Return a list of original words from text separated by ',' without spaces after ','. Do not separate one substance with ',' if it takes more than one word."""
 
-GRAPH_PROMPT = "Additional information below includes a subgraph displaying relations between those substances in JSON format. Use it to form the response as a ground truth. Do not mention the work JSON in the output"
+GRAPH_PROMPT = "Additional information below lists relations of those substances from a knowledge graph, grouped by relation, with 'all' for entities shared by every substance. Use it to form the response as a ground truth. Do not mention the knowledge graph format in the output"
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import pickle
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from loguru import logger
+
+import project_config
+from app.entity_names import BLOB_FILE, OFFSETS_FILE, entity_names
+from research_scripts.triplet_store import RELATION_OFFSETS_FILE, ENTITIES_FILE
+
+
+def file_signature(path) -> Optional[list]:
+    """Size and modification time of a file, None if it does not exist."""
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def graph_fingerprint() -> str:
+    """
+    Changes whenever drkg.tsv, the triplet store compiled from it, the entity name table
+    the vertex labels come from or the neighbourhood settings change.
+    The name table is compiled lazily, it is loaded first so its signature is the one
+    every later process sees.
+    """
+    entity_names.ensure_loaded()
+    signatures = [
+        project_config.FILTER_GRAPH_HOPS,
+        project_config.FILTER_GRAPH_MAX_DEGREE,
+        file_signature(project_config.PATH_DRKG),
+        file_signature(project_config.PATH_DRKG_STORE / RELATION_OFFSETS_FILE),
+        file_signature(project_config.PATH_DRKG_STORE / ENTITIES_FILE),
+        file_signature(project_config.PATH_ENTITY_NAME_TABLE / BLOB_FILE),
+        file_signature(project_config.PATH_ENTITY_NAME_TABLE / OFFSETS_FILE),
+    ]
+    return hashlib.sha256(json.dumps(signatures).encode("utf-8")).hexdigest()[:16]
+
+
+def relations_version(relations: Iterable[str]) -> str:
+    """Glossary version as seen by the subgraph: the hash of the selected relations."""
+    return hashlib.sha256(json.dumps(sorted(relations)).encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(drug_ids: Iterable[str], relations: Iterable[str]) -> str:
+    payload = json.dumps({"drugs": sorted(drug_ids), "relations": relations_version(relations)})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SubgraphCache:
+    """
+    Finished drug-neighbourhood subgraphs keyed by the sorted drug IDs and the relation set.
+    The most recently used subgraphs are kept in memory, all of them are pickled to disk
+    in a directory per graph fingerprint, so a new DrKG file starts a fresh cache and
+    the directories of older ones are pruned.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=None):
+        self.cache_dir = cache_dir or project_config.PATH_SUBGRAPH_CACHE
+        self.max_entries = max_entries or project_config.SUBGRAPH_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._fingerprint = None
+
+    @property
+    def directory(self):
+        if self._fingerprint is None:
+            self._fingerprint = graph_fingerprint()
+            self.prune()
+        return self.cache_dir / self._fingerprint
+
+    def prune(self):
+        """Remove the subgraphs of previous DrKG versions."""
+        if not self.cache_dir.exists():
+            return
+        for path in self.cache_dir.iterdir():
+            if path.is_dir() and path.name != self._fingerprint:
+                logger.info(f"Removing stale subgraph cache {path}")
+                shutil.rmtree(path, ignore_errors=True)
+
+    def get(self, drug_ids, relations) -> Optional[object]:
+        key = make_key(drug_ids, relations)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        path = self.directory / f"{key}.pkl"
+        if not path.exists():
+            self.misses += 1
+            return None
+        try:
+            with open(path, "rb") as f:
+                subgraph = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to read cached subgraph {path}: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, subgraph)
+        return subgraph
+
+    def put(self, drug_ids, relations, subgraph):
+        key = make_key(drug_ids, relations)
+        self._remember(key, subgraph)
+        directory = self.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name first, readers never see a partial pickle
+        tmp_path = directory / f"{key}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(subgraph, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(directory / f"{key}.pkl")
+
+    def _remember(self, key, subgraph):
+        with self._lock:
+            self._memory[key] = subgraph
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "in_memory": len(self._memory)}
+
+
+subgraph_cache = SubgraphCache()
@@ -1,10 +1,11 @@
-import json
 from loguru import logger
 import time
 
 import pandas as pd
 import numpy as np
 
+from app.entity_names import entity_names
+from app.pivot_store import load_pivot_store
 
 columns_pathway_function = [
     'gene_pathway_plus',
@@ -13,26 +14,27 @@ columns_pathway_function = [
     'gene_function_minus'
 ]
 
-def load_json_file(filepath):
+column_names = {
+    'drug_disease_minus': 'disease_associated_with_drug',
+    'drug_disease_plus': 'disease_cured_by_drug',
+    'drug_gene_minus': 'genes_inhibited_or_suppressed_by_drug',
+    'drug_gene_plus': 'genes_enhanced_or_activated_by_drug',
+    'drug_side_effect_plus': 'side_effects_assosiated_with_drug',
+    'gene_pathway_plus': 'gene_pathways_activated_by_drug',
+    'gene_pathway_minus': 'gene_pathways_inhibited_by_drug',
+    'gene_function_plus': 'molecular_function_activated_by_drug',
+    'gene_function_minus': 'molecular_function_inhibited_by_drug',
+}
+
+class PivotMapper:
     """
-    Load JSON data from a file into a Python dict.
+    Mapper for the drug pivot: relation columns get readable aliases,
+    entities get their short names from the shared entity name table.
     """
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)  # parses file into dict/list
-    return data
-
-def process_mapping(ent_mapper):
-    ent_mapper_new = {x:ent_mapper[x].split(':')[-1] for x in ent_mapper.keys()}
-    ent_mapper_new['drug_disease_minus'] = 'disease_associated_with_drug'
-    ent_mapper_new['drug_disease_plus'] = 'disease_cured_by_drug'
-    ent_mapper_new['drug_gene_minus'] = 'genes_inhibited_or_suppressed_by_drug'
-    ent_mapper_new['drug_gene_plus'] = 'genes_enhanced_or_activated_by_drug'
-    ent_mapper_new['drug_side_effect_plus'] = 'side_effects_assosiated_with_drug'
-    ent_mapper_new['gene_pathway_plus'] = 'gene_pathways_activated_by_drug'
-    ent_mapper_new['gene_pathway_minus'] = 'gene_pathways_inhibited_by_drug'
-    ent_mapper_new['gene_function_plus'] = 'molecular_function_activated_by_drug'
-    ent_mapper_new['gene_function_minus'] = 'molecular_function_inhibited_by_drug'
-    return ent_mapper_new
+    def get(self, key, default=None):
+        if key in column_names:
+            return column_names[key]
+        return entity_names.get(key, default, short=True)
 
 def map_cell(cell, mapper):
     """
@@ -59,32 +61,109 @@ def map_cell(cell, mapper):
     return new_val
 
 
+def map_values(values, mapper) -> np.ndarray:
+    """
+    Map a flat array of values: each distinct value is looked up once,
+    the results are gathered back by the factorized codes.
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    mapped = np.empty(len(uniques), dtype=object)
+    mapped[:] = [mapper.get(value, value) for value in uniques]
+    return mapped[codes]
+
+
+def object_array(items) -> np.ndarray:
+    """1-D object array of the items, without numpy turning equal-length lists into a 2-D array."""
+    array = np.empty(len(items), dtype=object)
+    for i, item in enumerate(items):
+        array[i] = item
+    return array
+
+
+def split_lists(flat, lengths) -> list:
+    """Split a flat array back into lists of the given lengths."""
+    bounds = np.cumsum(lengths).tolist()
+    return [flat[start:end].tolist() for start, end in zip([0] + bounds[:-1], bounds)]
+
+
 def map_dataframe(df, entity_mapper):
-    # 1) map all cells
-    df_mapped = df.map(lambda x: map_cell(x, entity_mapper))
+    """
+    Map all cells, the index and the columns of a pivot DataFrame.
+    List cells are flattened into one array, mapped in a single pass and split back.
+    """
+    cells = df.to_numpy(dtype=object).ravel()
+    is_list = np.fromiter((isinstance(cell, (list, np.ndarray)) for cell in cells), dtype=bool, count=len(cells))
+    is_scalar = ~is_list & ~pd.isna(pd.Series(cells, dtype=object)).to_numpy()
+
+    list_cells = cells[is_list]
+    lengths = [len(cell) for cell in list_cells]
+    flat = [item for cell in list_cells for item in cell]
+
+    mapped = cells.copy()
+    mapped[is_list] = object_array(split_lists(map_values(flat, entity_mapper), lengths))
+    mapped[is_scalar] = map_values(cells[is_scalar], entity_mapper)
     logger.info("Finished mapping cell values")
-    
-    # 2) map row index
-    logger.info("Mapping DataFrame index")
-    new_index = [entity_mapper.get(idx, idx).lower() for idx in df_mapped.index]
-    df_mapped.index = new_index
-
-    logger.info("Mapping DataFrame columns")
-    df_mapped.rename(columns=entity_mapper, inplace=True)
+
+    df_mapped = pd.DataFrame(mapped.reshape(df.shape), columns=df.columns)
+    df_mapped.index = [entity_mapper.get(idx, idx).lower() for idx in df.index]
+    df_mapped.rename(columns=lambda col: entity_mapper.get(col, col), inplace=True)
     return df_mapped
 
+
+def map_value_ids(ids, drug_pivot, mapper) -> np.ndarray:
+    """
+    Short names of pivot value IDs through the integer-indexed entity name table,
+    values outside DrKG go through the mapper.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    known = ids < len(entity_names)
+    names = np.empty(len(ids), dtype=object)
+    names[known] = entity_names.map_ids(ids[known], short=True)
+    names[~known] = map_values(drug_pivot.value_names(ids[~known]), mapper)
+    return names
+
+def top_ranked(ids, ranking, max_items) -> np.ndarray:
+    """
+    At most max_items of the value IDs of a cell, the best ranked first.
+    Values missing from the ranking keep their pivot order after the ranked ones.
+    """
+    if ranking:
+        scores = np.array([ranking.get(i, -1.0) for i in ids.tolist()])
+        ids = ids[np.argsort(-scores, kind="stable")]
+    return ids[:max_items] if max_items is not None else ids
+
 start = time.time()
-drug_pivot = pd.read_json("data/drug_pivot_full.json", orient="table").set_index("compound")
-ent_mapper_new = process_mapping(load_json_file('data/entity_name_mapping.json'))
-# drug_pivot_mapped = map_dataframe(drug_pivot, ent_mapper_new)
+drug_pivot = load_pivot_store()
+ent_mapper_new = PivotMapper()
 logger.info(f"Loaded substance mapping graph in {time.time() - start}s...")
 
-def create_json_for_llm(compounds: list, drug_pivot=drug_pivot, mapper=ent_mapper_new) -> dict:
+def create_json_for_llm(compounds: list, drug_pivot=drug_pivot, mapper=ent_mapper_new,
+                        ranking=None, max_per_cell=None) -> dict:
+    """
+    {relation column: {compound name: [entity names]}} for the requested compounds,
+    read from the pivot store rows of these compounds only.
+    ranking ({entity ID: score}, e.g. of the pruned subgraph) orders the entities of
+    every cell, of which at most max_per_cell are kept.
+    """
     logger.info(f"Finding {compounds}...")
     try:
-        drug_pivot_comp = drug_pivot.loc[compounds].dropna(axis=1, how='all').drop(columns=columns_pathway_function)
-        drug_pivot_comp_mapped = map_dataframe(drug_pivot_comp, mapper)
-        return drug_pivot_comp_mapped.to_dict()
+        columns = [c for c in drug_pivot.columns if c not in columns_pathway_function]
+        cells = drug_pivot.cell_ids(compounds, columns=columns)
+        keys = [(column, compound) for column, column_cells in cells.items() for compound in column_cells]
+        id_lists = [top_ranked(np.asarray(cells[column][compound]), ranking, max_per_cell) for column, compound in keys]
+        if not keys:
+            return {}
+
+        # One lookup for the values of all cells, then split back per cell
+        names = split_lists(
+            map_value_ids(np.concatenate(id_lists), drug_pivot, mapper),
+            [len(ids) for ids in id_lists],
+        )
+        compound_names = {compound: mapper.get(compound, compound).lower() for compound in compounds}
+        result = {}
+        for (column, compound), cell_names in zip(keys, names):
+            result.setdefault(mapper.get(column, column), {})[compound_names[compound]] = cell_names
+        return result
     except Exception as e:
         logger.error(e)
         return {}
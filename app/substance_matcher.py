@@ -0,0 +1,99 @@
+import re
+import time
+from collections import deque
+from typing import Iterable, List, Tuple
+
+from loguru import logger
+
+WORD_RE = re.compile(r"\w+")
+
+
+def words(text: str) -> List[str]:
+    """Lowercased word tokens, punctuation and spacing differences are ignored."""
+    return WORD_RE.findall(text.lower())
+
+
+class SubstanceMatcher:
+    """
+    Aho-Corasick automaton over substance names, built on word tokens rather than
+    characters: matches always start and end on word boundaries, and the trie stays
+    small enough for the full DrugBank vocabulary with synonyms.
+    All names are found in a single pass over the query, overlapping matches are
+    resolved leftmost-longest.
+    """
+
+    def __init__(self, names: Iterable[str], min_length=3):
+        start = time.time()
+        self.names = []
+        self.goto = {}          # (node, word) -> child node
+        self.fail = [0]
+        self.output = [-1]      # name index ending at the node, -1 if none
+        self.depth = [0]        # number of words from the root
+        self.output_link = [-1]  # nearest node down the fail chain with an output
+
+        for name in names:
+            tokens = words(name)
+            # Very short single words ("c", "ra") only produce false positives
+            if not tokens or (len(tokens) == 1 and len(tokens[0]) < min_length):
+                continue
+            node = 0
+            for token in tokens:
+                child = self.goto.get((node, token))
+                if child is None:
+                    child = len(self.fail)
+                    self.goto[(node, token)] = child
+                    self.fail.append(0)
+                    self.output.append(-1)
+                    self.depth.append(self.depth[node] + 1)
+                    self.output_link.append(-1)
+                node = child
+            if self.output[node] == -1:
+                self.output[node] = len(self.names)
+                self.names.append(name)
+            elif len(name) < len(self.names[self.output[node]]):
+                # Names differing only in punctuation share a state, keep the plainest one
+                self.names[self.output[node]] = name
+
+        self._build_links()
+        logger.info(f"Built substance matcher with {len(self.names)} names and {len(self.fail)} states in {time.time() - start}s")
+
+    def _build_links(self):
+        children = [[] for _ in self.fail]
+        for (node, token), child in self.goto.items():
+            children[node].append((token, child))
+
+        queue = deque(child for _, child in children[0])
+        while queue:
+            node = queue.popleft()
+            for token, child in children[node]:
+                state = self.fail[node]
+                while state and (state, token) not in self.goto:
+                    state = self.fail[state]
+                self.fail[child] = self.goto.get((state, token), 0)
+                link = self.fail[child]
+                self.output_link[child] = link if self.output[link] != -1 else self.output_link[link]
+                queue.append(child)
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """All (start word, end word, name) matches in the text, overlapping ones included."""
+        matches = []
+        node = 0
+        for i, token in enumerate(words(text)):
+            while node and (node, token) not in self.goto:
+                node = self.fail[node]
+            node = self.goto.get((node, token), 0)
+            state = node if self.output[node] != -1 else self.output_link[node]
+            while state != -1:
+                matches.append((i + 1 - self.depth[state], i + 1, self.names[self.output[state]]))
+                state = self.output_link[state]
+        return matches
+
+    def find(self, text: str) -> List[str]:
+        """Names found in the text, leftmost-longest and without overlaps, in text order."""
+        found = []
+        last_end = 0
+        for start, end, name in sorted(self.find_all(text), key=lambda m: (m[0], m[0] - m[1])):
+            if start >= last_end:
+                found.append(name)
+                last_end = end
+        return list(dict.fromkeys(found))
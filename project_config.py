@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Корень проекта — папка, где находится config.py
@@ -7,6 +8,8 @@ BASE_DIR = Path(__file__).resolve().parent
 SERVICE_ACCOUNT_FILE = BASE_DIR / "access/service_account.json"
 PATH_DRKG = BASE_DIR / 'data/drkg/drkg.tsv'
 PATH_GRAPH = BASE_DIR / 'data/drkg/graph.gml'
+PATH_DRKG_STORE = BASE_DIR / 'data/drkg/store'
+PATH_RELATION_GLOSSARY_DIR = BASE_DIR / 'data/drkg'
 PATH_DRUGBANK = BASE_DIR / 'data/drugbank/drugbank_vocabulary.csv'
 PATH_DRUGBANK_VOCABULARY = BASE_DIR / "data/drugbank/drugbank_vocabulary.csv"
 PATH_MESH = BASE_DIR / "data/mesh/desc2025.xml"
@@ -14,5 +17,95 @@ PATH_DOID = BASE_DIR / "data/doid/doid.obo"
 PATH_HGNC = BASE_DIR / "data/hgnc/HGNC_complete_set.tsv"
 PATH_SIDER = BASE_DIR / "data/sider/meddra_all_indications.tsv"
 PATH_ENTITY_NAME_MAPPING = BASE_DIR / "data/entity_name_mapping.json"
+PATH_ENTITY_NAME_TABLE = BASE_DIR / "data/drkg/store/entity_names"
+PATH_DRUG_PIVOT = BASE_DIR / "data/drug_pivot_full.json"
+PATH_DRUG_PIVOT_STORE = BASE_DIR / "data/drug_pivot_store"
 PATH_SUBGRAPH_PNG = BASE_DIR / "results/subgraph.png"
 PATH_SUBGRAPH_JSON = BASE_DIR / "results/subgraph.json"
+PATH_LLM_CACHE = BASE_DIR / "data/cache/llm_cache.sqlite"
+PATH_ARTIFACT_MANIFEST = BASE_DIR / "data/artifacts_manifest.json"
+
+# Seconds after which the Google Sheets relation glossary is refreshed in the background
+RELATION_GLOSSARY_TTL = 3600
+# After a failed fetch the worksheet is not fetched again for this many seconds, doubled
+# on every further failure up to the maximum
+RELATION_GLOSSARY_RETRY_BASE = 30
+RELATION_GLOSSARY_RETRY_MAX = 1800
+
+# LLM response cache: entry limit, maximum age in seconds, and whether final answers are cached too
+LLM_CACHE_MAX_ENTRIES = 10000
+LLM_CACHE_MAX_AGE = 7 * 24 * 3600
+LLM_CACHE_FINAL_ANSWER = os.environ.get("LLM_CACHE_FINAL_ANSWER", "0") == "1"
+
+# Local intent classifier: dataset and confidence thresholds below which the LLM decides
+PATH_INTENT_DATASET = BASE_DIR / "data/intent/labelled_queries.tsv"
+INTENT_MIN_SCORE = 0.3
+INTENT_MIN_MARGIN = 0.1
+
+# LLM clients: request timeout in seconds, retries with exponential backoff and concurrent requests per backend
+LLM_TIMEOUT = 60
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 8
+LLM_CONCURRENCY = {"llama": 8, "claude": 4}
+
+# Subgraph cache: on-disk location, subgraphs kept in memory, and compounds precomputed by the warm-up
+PATH_SUBGRAPH_CACHE = BASE_DIR / "data/cache/subgraphs"
+SUBGRAPH_CACHE_MAX_ENTRIES = 256
+SUBGRAPH_WARMUP_COMPOUNDS = [
+    "rapamycin",
+    "metformin",
+    "nicotinamide riboside",
+    "nicotinamide mononucleotide",
+    "resveratrol",
+    "spermidine",
+    "dasatinib",
+    "quercetin",
+    "fisetin",
+    "acarbose",
+    "NAD",
+    "aspirin",
+    "berberine",
+    "alpha-ketoglutarate",
+    "taurine",
+    "everolimus",
+    "curcumin",
+    "pterostilbene",
+    "melatonin",
+    "glucosamine",
+]
+SUBGRAPH_WARMUP_TOP_N = 20
+
+# Drug neighbourhood: hops around the query drugs, and the degree per node type above which
+# a vertex beyond the first hop is kept but not expanded
+FILTER_GRAPH_HOPS = 1
+FILTER_GRAPH_MAX_DEGREE = {
+    "Gene": 300,
+    "Compound": 300,
+    "Disease": 300,
+    "Side Effect": 100,
+    "Pathway": 500,
+}
+
+# Path search between the query drugs: maximum path length in edges and paths per pair of drugs
+PATH_SEARCH_MAX_HOPS = 3
+PATH_SEARCH_K = 10
+
+# Drug similarity index: location, neighbours kept per compound, and shared genes/diseases/pathways
+# a pair needs to count as similar
+PATH_DRUG_SIMILARITY = BASE_DIR / "data/drkg/store/drug_similarity"
+DRUG_SIMILARITY_K = 20
+DRUG_SIMILARITY_MIN_SHARED = 2
+
+# Graphs with more nodes + edges than this are rendered with WebGL (Scattergl) instead of SVG
+GRAPH_WEBGL_THRESHOLD = 1000
+
+# Computed graph layouts kept in memory, per graph and layout algorithm
+GRAPH_LAYOUT_CACHE_SIZE = 64
+# Share of a new graph's vertices that must be in the previous layout to start from it
+GRAPH_LAYOUT_SEED_MIN_OVERLAP = 0.8
+
+# Level of detail of the graph panel: vertices shown at most, and leaves of a type per compound
+# from which they are collapsed into a group
+GRAPH_LOD_MAX_NODES = 300
+GRAPH_LOD_MIN_GROUP = 3
@@ -0,0 +1,56 @@
+"""
+Accuracy and latency of the local intent classifier against the LLM path.
+Local accuracy is measured leave-one-out on the labelled query dataset.
+
+Usage: python -m research_scripts.benchmark_intent [--llm]
+"""
+import argparse
+import statistics
+import time
+
+from app.intent_classifier import IntentClassifier, load_labelled_queries
+
+
+def benchmark_local(queries, labels):
+    predictions, latencies = [], []
+    for i, query in enumerate(queries):
+        classifier = IntentClassifier().fit(queries[:i] + queries[i + 1:], labels[:i] + labels[i + 1:])
+        start = time.perf_counter()
+        predictions.append(classifier.predict(query))
+        latencies.append(time.perf_counter() - start)
+
+    correct = [label == truth for (label, _, _), truth in zip(predictions, labels)]
+    confident = [(ok, conf) for ok, (_, _, conf) in zip(correct, predictions) if conf]
+    print("Local classifier (leave-one-out):")
+    print(f"  accuracy:            {sum(correct) / len(correct):.2%}")
+    print(f"  confident coverage:  {len(confident) / len(correct):.2%}")
+    print(f"  confident accuracy:  {sum(ok for ok, _ in confident) / max(len(confident), 1):.2%}")
+    print(f"  median latency:      {statistics.median(latencies) * 1e6:.0f} us")
+
+
+def benchmark_llm(queries, labels):
+    # Imported here: the pipeline loads the graph and the vocabularies at import
+    from app.clients import query_llama
+    from app.pipeline import llama_params_det, task_prompt
+
+    correct, latencies = [], []
+    for query, truth in zip(queries, labels):
+        start = time.perf_counter()
+        label = query_llama(task_prompt(query), params=llama_params_det).strip()
+        latencies.append(time.perf_counter() - start)
+        correct.append(label == truth)
+
+    print("LLM classifier:")
+    print(f"  accuracy:            {sum(correct) / len(correct):.2%}")
+    print(f"  median latency:      {statistics.median(latencies) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm", action="store_true", help="Also query the LLM for every labelled query")
+    args = parser.parse_args()
+
+    queries, labels = load_labelled_queries()
+    benchmark_local(queries, labels)
+    if args.llm:
+        benchmark_llm(queries, labels)
@@ -0,0 +1,117 @@
+"""
+Per-cell mapping (DataFrame.map with map_cell, how create_json_for_llm used to map the
+pivot rows) against the bulk path it uses now: map_value_ids over the concatenated
+value IDs of all requested cells, and the whole create_json_for_llm request.
+Runs on a synthetic DrKG-like triplet store, entity name table and drug pivot written
+to a temporary directory, so it does not need the data artifacts.
+
+Usage: python -m research_scripts.benchmark_mapping [n_compounds ...]
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import project_config
+
+N_ENTITIES = 100_000
+N_PIVOT_COMPOUNDS = 1_000
+PIVOT_COLUMNS = [
+    'drug_disease_minus', 'drug_disease_plus', 'drug_gene_minus', 'drug_gene_plus',
+    'drug_side_effect_plus', 'gene_pathway_plus', 'gene_pathway_minus',
+    'gene_function_plus', 'gene_function_minus',
+]
+NODE_TYPES = ['Gene', 'Disease', 'Side Effect', 'Pathway']
+
+
+def synthetic_data(directory: Path, seed=0):
+    """
+    Point the data paths to directory and compile a triplet store, entity name table and
+    drug pivot store there: N_PIVOT_COMPOUNDS compounds with 0-60 values per cell, 2% of
+    them unknown to DrKG, and names for 90% of the entities.
+    """
+    project_config.PATH_DRKG = directory / "drkg.tsv"
+    project_config.PATH_DRKG_STORE = directory / "store"
+    project_config.PATH_ENTITY_NAME_MAPPING = directory / "entity_name_mapping.json"
+    project_config.PATH_ENTITY_NAME_TABLE = directory / "store/entity_names"
+    project_config.PATH_DRUG_PIVOT = directory / "drug_pivot_full.json"
+    project_config.PATH_DRUG_PIVOT_STORE = directory / "drug_pivot_store"
+    # Imported once the paths are set, the entity name table is a singleton reading them
+    from app.entity_names import compile_entity_name_table
+    from app.pivot_store import compile_pivot_store
+    from research_scripts.triplet_store import compile_triplet_store, get_triplet_store
+
+    rng = np.random.default_rng(seed)
+    compounds = [f"Compound::DB{i:05d}" for i in range(N_PIVOT_COMPOUNDS)]
+    entities = [f"{NODE_TYPES[i % len(NODE_TYPES)]}::{i}" for i in range(N_ENTITIES - N_PIVOT_COMPOUNDS)]
+    heads = rng.choice(compounds + entities, N_ENTITIES)
+    pd.DataFrame({0: heads, 1: "DRKG::interacts", 2: compounds + entities}).to_csv(
+        project_config.PATH_DRKG, sep="\t", header=False, index=False
+    )
+
+    named = rng.random(N_ENTITIES) < 0.9
+    with open(project_config.PATH_ENTITY_NAME_MAPPING, "w") as f:
+        json.dump({key: f"{key.split('::')[0]}::entity name {i}"
+                   for i, key in enumerate(compounds + entities) if named[i]}, f)
+
+    def cell():
+        n = int(rng.integers(0, 60))
+        return [entities[i] if rng.random() > 0.02 else f"Unknown::{i}" for i in rng.integers(0, len(entities), n)]
+
+    pivot = pd.DataFrame([[cell() for _ in PIVOT_COLUMNS] for _ in compounds], columns=PIVOT_COLUMNS)
+    pivot.insert(0, "compound", compounds)
+    pivot.to_json(project_config.PATH_DRUG_PIVOT, orient="table", index=False)
+
+    # Compiled here rather than on first load, which would record them in the manifest
+    compile_triplet_store()
+    compile_entity_name_table(get_triplet_store())
+    compile_pivot_store()
+
+
+def pivot_frame(drug_pivot, compounds, columns) -> pd.DataFrame:
+    """The pivot rows of the compounds as a DataFrame of DrKG key lists, as create_json_for_llm used to see them."""
+    cells = drug_pivot.cell_ids(compounds, columns=columns)
+    return pd.DataFrame({
+        column: {compound: drug_pivot.value_names(ids) for compound, ids in column_cells.items()}
+        for column, column_cells in cells.items()
+    }).reindex(compounds)
+
+
+def timed(func, repeat=5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [1, 2, 5, 10, 50, 200]
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic_data(Path(tmp))
+        # Loads the pivot store at import, so only once the paths point to the synthetic data
+        from app.substance_mapper import (
+            columns_pathway_function, create_json_for_llm, drug_pivot, ent_mapper_new, map_cell, map_value_ids,
+        )
+        columns = [c for c in drug_pivot.columns if c not in columns_pathway_function]
+        create_json_for_llm(drug_pivot.compounds[:1])
+
+        print(f"{'compounds':>10} {'values':>8} {'per-cell':>10} {'bulk ids':>10} {'json':>10} {'speedup':>8}")
+        for n in sizes:
+            compounds = drug_pivot.compounds[:n]
+            df = pivot_frame(drug_pivot, compounds, columns)
+            ids = np.concatenate([ids for cells in drug_pivot.cell_ids(compounds, columns=columns).values()
+                                  for ids in cells.values()])
+
+            per_cell = timed(lambda: df.map(lambda x: map_cell(x, ent_mapper_new)))
+            bulk = timed(lambda: map_value_ids(ids, drug_pivot, ent_mapper_new))
+            json_time = timed(lambda: create_json_for_llm(compounds))
+            print(
+                f"{n:>10} {len(ids):>8} {per_cell * 1e3:>8.2f}ms {bulk * 1e3:>8.2f}ms "
+                f"{json_time * 1e3:>8.2f}ms {per_cell / bulk:>7.1f}x"
+            )
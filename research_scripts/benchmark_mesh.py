@@ -0,0 +1,81 @@
+"""
+Wall time and peak memory of reading the MeSH descriptor names with ET.parse (the whole
+DOM, as mapping_id did before) against the streaming iterparse of mapping_id.mesh_names.
+Every parser runs in a fresh spawned process, so its peak RSS is its own.
+Runs on desc2025.xml if present, otherwise on a synthetic file with records of a similar
+size (about 8 KB each, 30k records by default as in the real descriptor file).
+
+Usage: python -m research_scripts.benchmark_mesh [n_records]
+"""
+import multiprocessing
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import project_config
+from research_scripts.mapping_id import mesh_names, peak_rss_mb
+
+
+def mesh_names_dom(path) -> dict:
+    """The former parser: the whole file as one tree, then every DescriptorRecord in it."""
+    mapping_disease = {}
+    root = ET.parse(path).getroot()
+    for record in root.findall(".//DescriptorRecord"):
+        mesh_ui = record.findtext("DescriptorUI")
+        name = record.find("DescriptorName/String").text
+        if mesh_ui and name:
+            mapping_disease[f"Disease::MESH:{mesh_ui}"] = f"Disease::MESH:{name}"
+    return mapping_disease
+
+
+def write_synthetic_mesh(path, n_records):
+    """MeSH-like descriptor file: every record with a few concepts, terms and a scope note."""
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0"?>\n<DescriptorRecordSet LanguageCode="eng">\n')
+        for i in range(n_records):
+            concepts = "".join(
+                f"<Concept PreferredConceptYN=\"{'Y' if c == 0 else 'N'}\"><ConceptUI>M{i:07d}{c}</ConceptUI>"
+                f"<ConceptName><String>Concept {i} {c}</String></ConceptName>"
+                f"<ScopeNote>{'A description of the concept. ' * 20}</ScopeNote>"
+                "<TermList>" + "".join(
+                    f"<Term ConceptPreferredTermYN=\"N\"><TermUI>T{i:07d}{c}{t}</TermUI>"
+                    f"<String>Term {i} {c} {t}</String><DateCreated><Year>2000</Year><Month>01</Month>"
+                    f"<Day>01</Day></DateCreated><ThesaurusIDlist><ThesaurusID>NLM (2000)</ThesaurusID>"
+                    f"</ThesaurusIDlist></Term>"
+                    for t in range(8)
+                ) + "</TermList></Concept>"
+                for c in range(3)
+            )
+            f.write(
+                f"<DescriptorRecord DescriptorClass=\"1\"><DescriptorUI>D{i:06d}</DescriptorUI>"
+                f"<DescriptorName><String>Descriptor {i}</String></DescriptorName>"
+                f"<TreeNumberList><TreeNumber>C{i % 26:02d}.{i:03d}</TreeNumber></TreeNumberList>"
+                f"<ConceptList>{concepts}</ConceptList></DescriptorRecord>\n"
+            )
+        f.write("</DescriptorRecordSet>\n")
+
+
+def timed_parser(parser, path):
+    start, baseline_mb = time.time(), peak_rss_mb()
+    n_names = len(parser(path))
+    return n_names, time.time() - start, baseline_mb, peak_rss_mb()
+
+
+if __name__ == "__main__":
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 30_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = project_config.PATH_MESH
+        if not path.exists():
+            path = Path(tmp) / "desc_synthetic.xml"
+            write_synthetic_mesh(path, n_records)
+        print(f"{path.name}: {path.stat().st_size / 1e6:.0f} MB")
+
+        print(f"{'parser':>10} {'names':>8} {'time':>8} {'peak RSS':>10} {'parsing':>10}")
+        context = multiprocessing.get_context("spawn")
+        for label, parser in [("ET.parse", mesh_names_dom), ("iterparse", mesh_names)]:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as executor:
+                n_names, seconds, baseline_mb, peak_mb = executor.submit(timed_parser, parser, path).result()
+            print(f"{label:>10} {n_names:>8} {seconds:>7.1f}s {peak_mb:>7.0f} MB {peak_mb - baseline_mb:>+7.0f} MB")
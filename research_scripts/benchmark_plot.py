@@ -0,0 +1,51 @@
+"""
+Figure build time and JSON payload of the graph renderer across graph sizes,
+with SVG (Scatter) and WebGL (Scattergl) traces. Layouts are computed once per graph
+and timed separately, they do not depend on the renderer.
+
+Usage: python -m research_scripts.benchmark_plot [n_vertices ...]
+"""
+import sys
+import time
+
+import igraph as ig
+import numpy as np
+
+from streamlit_app.graph_plot import plot_igraph_with_plotly
+
+NODE_TYPES = ['Compound', 'Gene', 'Disease', 'Side Effect']
+
+
+def sample_graph(n) -> ig.Graph:
+    """Scale-free graph with DrKG-like vertex names and relations."""
+    g = ig.Graph.Barabasi(n, 2)
+    rng = np.random.default_rng(0)
+    g.vs['name'] = [f"{NODE_TYPES[t]}::{i}" for i, t in enumerate(rng.integers(0, len(NODE_TYPES), n))]
+    g.vs['label'] = [f"entity {i}" for i in range(n)]
+    g.es['relation'] = ['DRKG::interacts'] * g.ecount()
+    return g
+
+
+def timed(func, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100, 1000, 5000, 20000]
+    print(f"{'vertices':>9} {'edges':>8} {'layout':>10} {'svg build':>10} {'svg json':>10} {'gl build':>10} {'gl json':>10}")
+    for n in sizes:
+        g = sample_graph(n)
+        layout_time, layout = timed(lambda: g.layout("fr"), repeat=1)
+        svg_time, svg = timed(lambda: plot_igraph_with_plotly(g, layout=layout, webgl=False))
+        gl_time, gl = timed(lambda: plot_igraph_with_plotly(g, layout=layout, webgl=True))
+        svg_size = len(svg.to_json()) / 1e6
+        gl_size = len(gl.to_json()) / 1e6
+        print(
+            f"{n:>9} {g.ecount():>8} {layout_time * 1e3:>8.0f}ms {svg_time * 1e3:>8.1f}ms {svg_size:>8.2f}MB "
+            f"{gl_time * 1e3:>8.1f}ms {gl_size:>8.2f}MB"
+        )
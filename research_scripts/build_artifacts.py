@@ -0,0 +1,339 @@
+"""
+Incremental build of the derived data artifacts.
+Every artifact knows its input files and the artifacts it is built from. Inputs are
+fingerprinted by content, an artifact is rebuilt only if the fingerprint of its inputs
+or of an artifact it depends on changed, or an output is missing. Independent artifacts
+are built in parallel processes. The result is recorded in a manifest, checked by the
+app at startup. Artifacts the app compiles itself on first load are recorded too.
+
+Usage: python -m research_scripts.build_artifacts [artifact ...] [--force] [--jobs N]
+"""
+import argparse
+import hashlib
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from loguru import logger
+
+import project_config
+
+# Bumped when a builder changes its output format, forcing a rebuild of the artifact
+BUILD_VERSION = 1
+
+
+# Builders import their modules when run, so a missing optional dependency of one
+# artifact does not prevent building the others
+def build_triplet_store():
+    from research_scripts.triplet_store import compile_triplet_store
+    compile_triplet_store()
+
+
+def build_entity_names():
+    from research_scripts.mapping_id import create_entity_name_mapping
+    create_entity_name_mapping()
+
+
+def build_drug_pivot_store():
+    from app.pivot_store import compile_pivot_store
+    compile_pivot_store()
+
+
+def build_drug_similarity():
+    from research_scripts.drug_similarity import compile_drug_similarity
+    compile_drug_similarity()
+
+
+def build_graph_gml():
+    from research_scripts.loading_graph import loading_graph
+    loading_graph(project_config.PATH_DRKG)
+
+
+class Artifact:
+    """
+    A derived artifact: input files, artifacts it is built from, output paths, and the
+    module-level build function run in a worker process. Artifacts with default=False
+    are only built when requested by name.
+    """
+
+    def __init__(self, name, inputs, deps, outputs, build, default=True):
+        self.name = name
+        self.inputs = inputs
+        self.deps = deps
+        self.outputs = outputs
+        self.build = build
+        self.default = default
+
+
+# drug_pivot_full.json has no builder in the repository, it is treated as an input
+ARTIFACTS = {
+    artifact.name: artifact for artifact in [
+        Artifact(
+            "triplet_store",
+            inputs=[project_config.PATH_DRKG],
+            deps=[],
+            outputs=[project_config.PATH_DRKG_STORE / "relation_offsets.npy"],
+            build=build_triplet_store,
+        ),
+        Artifact(
+            "entity_names",
+            inputs=[
+                project_config.PATH_DRUGBANK_VOCABULARY,
+                project_config.PATH_MESH,
+                project_config.PATH_DOID,
+                project_config.PATH_HGNC,
+                project_config.PATH_SIDER,
+            ],
+            deps=["triplet_store"],
+            outputs=[
+                project_config.PATH_ENTITY_NAME_MAPPING,
+                project_config.PATH_ENTITY_NAME_TABLE / "offsets.npy",
+            ],
+            build=build_entity_names,
+        ),
+        Artifact(
+            "drug_pivot_store",
+            inputs=[project_config.PATH_DRUG_PIVOT],
+            deps=["triplet_store"],
+            outputs=[project_config.PATH_DRUG_PIVOT_STORE / "values.npy"],
+            build=build_drug_pivot_store,
+        ),
+        Artifact(
+            "drug_similarity",
+            inputs=[],
+            deps=["triplet_store"],
+            outputs=[project_config.PATH_DRUG_SIMILARITY / "similarity.npz"],
+            build=build_drug_similarity,
+        ),
+        Artifact(
+            "graph_gml",
+            inputs=[project_config.PATH_DRKG],
+            deps=[],
+            outputs=[project_config.PATH_GRAPH],
+            build=build_graph_gml,
+            default=False,
+        ),
+    ]
+}
+
+
+def relative(path) -> str:
+    return str(path.relative_to(project_config.BASE_DIR))
+
+
+def load_manifest(path=None) -> dict:
+    path = path or project_config.PATH_ARTIFACT_MANIFEST
+    if not path.exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=None):
+    path = path or project_config.PATH_ARTIFACT_MANIFEST
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    tmp_path.replace(path)
+
+
+def file_signature(path) -> dict:
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def file_hash(path, known=None) -> dict:
+    """
+    Signature and SHA-256 of a file. The hash of a previous build is reused when size and
+    modification time did not change, so unchanged inputs are not read again.
+    """
+    signature = file_signature(path)
+    if known and all(known.get(k) == v for k, v in signature.items()):
+        return known
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return {**signature, "sha256": digest.hexdigest()}
+
+
+def artifact_key(input_hashes, dep_keys) -> str:
+    payload = json.dumps({
+        "version": BUILD_VERSION,
+        "inputs": {path: h["sha256"] for path, h in input_hashes.items()},
+        "deps": dep_keys,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def manifest_entry(artifact, previous, dep_keys) -> dict:
+    """Manifest entry of an artifact: its key, input hashes, dependency keys and outputs."""
+    input_hashes = {
+        relative(p): file_hash(p, previous.get("inputs", {}).get(relative(p)))
+        for p in artifact.inputs
+    }
+    return {
+        "key": artifact_key(input_hashes, dep_keys),
+        "inputs": input_hashes,
+        "deps": dep_keys,
+        "outputs": [relative(p) for p in artifact.outputs],
+    }
+
+
+def mark_built(entry, artifact) -> dict:
+    entry["built"] = time.time()
+    entry["outputs_signature"] = {
+        relative(p): file_signature(p) for p in artifact.outputs if p.exists()
+    }
+    return entry
+
+
+def record_build(name, from_inputs=True):
+    """
+    Record an artifact built outside build(), by the app on first load, in the manifest
+    against the dependency keys recorded there, so check_manifest does not report it.
+    from_inputs=False is for a partial rebuild that did not read the inputs (the entity name
+    table compiled from an existing mapping): the input hashes of the last full build are
+    kept, so changed inputs are still reported, and nothing is recorded without one.
+    Nothing is recorded if an input is missing or the manifest cannot be written.
+    """
+    artifact = ARTIFACTS[name]
+    if missing_inputs := [p for p in artifact.inputs if not p.exists()]:
+        logger.warning(f"{name}: not recorded in the manifest, missing inputs {', '.join(relative(p) for p in missing_inputs)}")
+        return
+    try:
+        manifest = load_manifest()
+        previous = manifest.get(name)
+        dep_keys = {dep: manifest.get(dep, {}).get("key") for dep in artifact.deps}
+        if from_inputs:
+            entry = manifest_entry(artifact, previous or {}, dep_keys)
+        elif previous is None:
+            logger.warning(f"{name}: not recorded in the manifest, never built from its inputs")
+            return
+        else:
+            entry = {**previous, "key": artifact_key(previous["inputs"], dep_keys), "deps": dep_keys}
+        manifest[name] = mark_built(entry, artifact)
+        save_manifest(manifest)
+    except OSError as e:
+        logger.warning(f"{name}: not recorded in the manifest: {e}")
+
+
+def with_dependencies(names) -> list:
+    """The requested artifacts and everything they depend on, dependencies first."""
+    ordered = []
+
+    def visit(name):
+        if name in ordered:
+            return
+        for dep in ARTIFACTS[name].deps:
+            visit(dep)
+        ordered.append(name)
+
+    for name in names:
+        visit(name)
+    return ordered
+
+
+def build(names=None, force=False, jobs=None):
+    """Bring the artifacts up to date, rebuilding only what changed, and record the manifest."""
+    names = with_dependencies(names or [name for name, a in ARTIFACTS.items() if a.default])
+    manifest = load_manifest()
+    start = time.time()
+
+    keys, pending, running = {}, list(names), {}
+    built, failed = [], []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            # Start every artifact whose dependencies are up to date
+            for name in list(pending):
+                artifact = ARTIFACTS[name]
+                if any(dep in failed for dep in artifact.deps):
+                    pending.remove(name)
+                    failed.append(name)
+                    logger.error(f"{name}: skipped, a dependency failed")
+                    continue
+                if not all(dep in keys for dep in artifact.deps):
+                    continue
+                pending.remove(name)
+
+                missing_inputs = [p for p in artifact.inputs if not p.exists()]
+                if missing_inputs:
+                    failed.append(name)
+                    logger.error(f"{name}: missing inputs {', '.join(relative(p) for p in missing_inputs)}")
+                    continue
+
+                previous = manifest.get(name, {})
+                entry = manifest_entry(artifact, previous, {dep: keys[dep] for dep in artifact.deps})
+                outputs_exist = all(p.exists() for p in artifact.outputs)
+                if not force and previous.get("key") == entry["key"] and outputs_exist:
+                    keys[name] = entry["key"]
+                    logger.info(f"{name}: up to date")
+                    continue
+                logger.info(f"{name}: building...")
+                running[executor.submit(artifact.build)] = (name, entry, time.time())
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, entry, started = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.append(name)
+                    logger.error(f"{name}: build failed: {e}")
+                    continue
+                manifest[name] = mark_built(entry, ARTIFACTS[name])
+                keys[name] = entry["key"]
+                built.append(name)
+                save_manifest(manifest)
+                logger.info(f"{name}: built in {time.time() - started:.1f}s")
+
+    logger.info(
+        f"Artifacts up to date in {time.time() - start:.1f}s: "
+        f"{len(built)} built, {len(keys) - len(built)} unchanged, {len(failed)} failed"
+    )
+    return not failed
+
+
+def check_manifest(names=None) -> list:
+    """
+    Startup check: artifacts missing from the manifest, with missing outputs, or whose inputs
+    changed since they were built (by size and modification time, nothing is hashed).
+    Returns the stale artifact names and logs a warning for each.
+    """
+    manifest = load_manifest()
+    stale = []
+    for name in with_dependencies(names or [name for name, a in ARTIFACTS.items() if a.default]):
+        artifact = ARTIFACTS[name]
+        entry = manifest.get(name)
+        if entry is None:
+            reason = "not in the manifest"
+        elif not all(p.exists() for p in artifact.outputs):
+            reason = "outputs missing"
+        elif any(
+            not p.exists() or any(entry["inputs"].get(relative(p), {}).get(k) != v for k, v in file_signature(p).items())
+            for p in artifact.inputs
+        ):
+            reason = "inputs changed"
+        elif any(dep in stale for dep in artifact.deps):
+            reason = "a dependency is stale"
+        elif any(manifest.get(dep, {}).get("key") != key for dep, key in entry.get("deps", {}).items()):
+            reason = "dependencies rebuilt since"
+        else:
+            continue
+        stale.append(name)
+        logger.warning(f"Data artifact {name} is stale ({reason}), run: python -m research_scripts.build_artifacts")
+    return stale
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the derived data artifacts that are out of date")
+    parser.add_argument("artifacts", nargs="*", help=f"any of {', '.join(ARTIFACTS)}, default: all but graph_gml")
+    parser.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel builds")
+    args = parser.parse_args()
+    if unknown := [name for name in args.artifacts if name not in ARTIFACTS]:
+        parser.error(f"unknown artifacts: {', '.join(unknown)}")
+    raise SystemExit(0 if build(args.artifacts, force=args.force, jobs=args.jobs) else 1)
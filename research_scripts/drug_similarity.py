@@ -0,0 +1,158 @@
+import json
+import time
+from functools import lru_cache
+
+import numpy as np
+from loguru import logger
+from scipy import sparse
+
+import project_config
+from research_scripts.triplet_store import get_triplet_store
+
+FEATURE_TYPES = ("Gene", "Disease", "Pathway")
+DRUGS_FILE = "drugs.json"
+INDEX_FILE = "similarity.npz"
+
+
+def entity_types(store) -> np.ndarray:
+    """DrKG type of every entity ID: 'Gene::1234' -> 'Gene'."""
+    return np.array([name.split("::")[0] for name in store.entities])
+
+
+def incidence_matrix(store, feature_types=FEATURE_TYPES):
+    """
+    Binary compound x feature matrix over all triplets linking a compound to an entity
+    of one of the feature types, in either direction and under any relation.
+    Returns the matrix with the entity IDs of its rows and columns.
+    """
+    types = entity_types(store)
+    is_compound = types == "Compound"
+    is_feature = np.isin(types, feature_types)
+    heads = np.asarray(store.heads)
+    tails = np.asarray(store.tails)
+
+    forward = is_compound[heads] & is_feature[tails]
+    backward = is_feature[heads] & is_compound[tails]
+    drugs = np.concatenate([heads[forward], tails[backward]])
+    features = np.concatenate([tails[forward], heads[backward]])
+
+    drug_ids, rows = np.unique(drugs, return_inverse=True)
+    feature_ids, columns = np.unique(features, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+        shape=(len(drug_ids), len(feature_ids)),
+    )
+    # Repeated links under several relations are summed, only presence counts
+    matrix.data[:] = 1
+    return matrix, drug_ids, feature_ids
+
+
+def compile_drug_similarity(index_dir=None, k=None, min_shared=None, block_size=1000):
+    """
+    Offline job: top-k Jaccard neighbours of every compound by shared genes, diseases and pathways.
+    Intersections come from the sparse product A @ A.T, computed a block of rows at a time
+    so memory stays bounded. Pairs sharing fewer than min_shared features are ignored.
+    """
+    if index_dir is None:
+        index_dir = project_config.PATH_DRUG_SIMILARITY
+    k = k or project_config.DRUG_SIMILARITY_K
+    min_shared = min_shared or project_config.DRUG_SIMILARITY_MIN_SHARED
+
+    start = time.time()
+    store = get_triplet_store()
+    matrix, drug_ids, _ = incidence_matrix(store)
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+    transposed = matrix.T.tocsc()
+
+    n = len(drug_ids)
+    neighbours = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    shared = np.zeros((n, k), dtype=np.int32)
+    for block_start in range(0, n, block_size):
+        block = (matrix[block_start:block_start + block_size] @ transposed).tocsr()
+        for i in range(block.shape[0]):
+            row = block_start + i
+            columns = block.indices[block.indptr[i]:block.indptr[i + 1]]
+            counts = block.data[block.indptr[i]:block.indptr[i + 1]]
+            keep = (columns != row) & (counts >= min_shared)
+            columns, counts = columns[keep], counts[keep]
+            if len(columns) == 0:
+                continue
+            jaccard = counts / (sizes[row] + sizes[columns] - counts)
+            top = np.argsort(-jaccard, kind="stable")[:k]
+            neighbours[row, :len(top)] = columns[top]
+            scores[row, :len(top)] = jaccard[top]
+            shared[row, :len(top)] = counts[top]
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    with open(index_dir / DRUGS_FILE, "w") as f:
+        json.dump(drug_ids.tolist(), f)
+    np.savez(index_dir / INDEX_FILE, neighbours=neighbours, scores=scores, shared=shared)
+    logger.info(f"Compiled drug similarity index of {n} compounds and {matrix.shape[1]} features in {time.time() - start}s")
+
+
+class DrugSimilarityIndex:
+    """
+    Top-k similar compounds of every compound, rows indexed by compound.
+    neighbours holds row numbers (-1 for empty slots), scores the Jaccard similarity
+    and shared the number of shared genes, diseases and pathways.
+    """
+
+    def __init__(self, drug_ids, neighbours, scores, shared):
+        self.drug_ids = drug_ids
+        self.neighbours = neighbours
+        self.scores = scores
+        self.shared = shared
+        self.row_index = {drug_id: row for row, drug_id in enumerate(drug_ids)}
+
+    def similar(self, entity_ids, k=10) -> list:
+        """
+        [(entity ID, score, shared features)] of the compounds most similar to the given ones,
+        best first. With several query compounds a candidate gets the Jaccard similarity and
+        shared feature count of the query compound it is closest to, ties go to candidates
+        close to more query compounds. The query compounds themselves are left out.
+        """
+        rows = [self.row_index[i] for i in entity_ids if i in self.row_index]
+        best, matches = {}, {}
+        for row in rows:
+            for neighbour, score, shared in zip(self.neighbours[row], self.scores[row], self.shared[row]):
+                if neighbour < 0:
+                    break
+                matches[neighbour] = matches.get(neighbour, 0) + 1
+                if neighbour not in best or score > best[neighbour][0]:
+                    best[neighbour] = (float(score), int(shared))
+        query = set(rows)
+        ranked = sorted((n for n in best if n not in query), key=lambda n: (best[n][0], matches[n]), reverse=True)[:k]
+        return [(self.drug_ids[n], *best[n]) for n in ranked]
+
+
+def load_drug_similarity(index_dir=None) -> DrugSimilarityIndex:
+    """
+    Load the similarity index. It is only built offline, if it is missing an empty index
+    is returned, so no similar compounds are suggested.
+    """
+    if index_dir is None:
+        index_dir = project_config.PATH_DRUG_SIMILARITY
+
+    if not (index_dir / INDEX_FILE).exists():
+        logger.warning(
+            f"Drug similarity index not found in {index_dir}, no similar compounds will be suggested. "
+            "Build it with: python -m research_scripts.build_artifacts drug_similarity"
+        )
+        empty = np.empty((0, 0))
+        return DrugSimilarityIndex([], empty.astype(np.int32), empty.astype(np.float32), empty.astype(np.int32))
+
+    with open(index_dir / DRUGS_FILE, "r") as f:
+        drug_ids = json.load(f)
+    arrays = np.load(index_dir / INDEX_FILE)
+    return DrugSimilarityIndex(drug_ids, arrays["neighbours"], arrays["scores"], arrays["shared"])
+
+
+@lru_cache(maxsize=None)
+def get_drug_similarity() -> DrugSimilarityIndex:
+    """Process-wide drug similarity index loaded from the default location."""
+    return load_drug_similarity()
+
+
+if __name__ == "__main__":
+    compile_drug_similarity()
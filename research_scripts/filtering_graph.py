@@ -1,16 +1,66 @@
-def filter_graph(graph, drug_ids):
+from loguru import logger
+
+
+def node_type(name):
+    """DrKG entity type: 'Gene::1234' -> 'Gene'."""
+    return name.split("::")[0]
+
+
+def resolve_vertices(graph, drug_ids):
+    """Vertex indices of the targets, given either as indices or as vertex names."""
+    if all(isinstance(d, int) for d in drug_ids):
+        return list(drug_ids)
+    indices = []
+    for drug_id in drug_ids:
+        try:
+            # find() goes through igraph's name index instead of scanning the vertices
+            indices.append(graph.vs.find(name=drug_id).index)
+        except ValueError:
+            logger.warning(f"{drug_id} not found in the graph.")
+    return indices
+
+
+def expandable(graph, vertices, max_degree):
+    """Vertices whose degree is within the cap of their node type, hubs are not expanded further."""
+    if max_degree is None:
+        return vertices
+    degrees = graph.degree(vertices)
+    names = graph.vs[vertices]["name"]
+    kept = []
+    for v, degree, name in zip(vertices, degrees, names):
+        cap = max_degree if isinstance(max_degree, int) else max_degree.get(node_type(name))
+        if cap is None or degree <= cap:
+            kept.append(v)
+    return kept
+
+
+def filter_graph(graph, drug_ids, hops=1, max_degree=None):
     """
     Filters the input graph based on the specified target nodes.
+    drug_ids are either vertex names or vertex indices.
+    Keeps every vertex within `hops` steps of a target. max_degree (an int, or a
+    {node type: int} dict) caps the degree of vertices expanded beyond the first hop:
+    hubs above it are kept but their neighbours are not added.
     """
-    # Find nodes related to the target nodes
-    target_indices = [v.index for v in graph.vs if v["name"] in drug_ids]
-    related_nodes = set(target_indices)
+    target_indices = resolve_vertices(graph, drug_ids)
+    if not target_indices:
+        return graph.induced_subgraph([])
 
-    # Include neighbors of target nodes
-    for idx in target_indices:
-        related_nodes.update(
-            graph.neighbors(idx, mode="all")
-        )  #"out" or "in" can be used here 
+    if max_degree is None:
+        neighbourhoods = graph.neighborhood(target_indices, order=hops, mode="all")
+        related_nodes = set(v for neighbourhood in neighbourhoods for v in neighbourhood)
+    else:
+        # Level by level, the frontier of each level is expanded in one bulk call
+        related_nodes = set(target_indices)
+        frontier = target_indices
+        for hop in range(hops):
+            if hop > 0:
+                frontier = expandable(graph, frontier, max_degree)
+            if not frontier:
+                break
+            neighbourhoods = graph.neighborhood(frontier, order=1, mode="all", mindist=1)
+            frontier = list(set(v for neighbourhood in neighbourhoods for v in neighbourhood) - related_nodes)
+            related_nodes.update(frontier)
 
-    subg = graph.induced_subgraph(list(related_nodes))
+    subg = graph.induced_subgraph(sorted(related_nodes))
     return subg
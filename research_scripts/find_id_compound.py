@@ -2,6 +2,11 @@ import pandas as pd
 import re
 import project_config
 import difflib
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from loguru import logger
 
 
 def find_closest_name(drug, df):
@@ -19,50 +24,113 @@ def match_partial(val, drug):
     return re.search(rf'\b{re.escape(drug.lower())}\b', str(val).lower()) is not None
 
 
+def normalize_name(name: str) -> str:
+    """Lowercase and collapse whitespace, the key used by every resolver index."""
+    return " ".join(str(name).lower().split())
+
+
+def name_trigrams(name: str) -> set:
+    """Character trigrams of a normalized name, padded so short names still get some."""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DrugNameResolver:
+    """
+    DrugBank name resolver built once from the vocabulary.
+    Exact hits come from a hash index on normalized common names and synonyms,
+    near matches from a trigram inverted index whose best candidates are
+    rescored with difflib's ratio.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = project_config.PATH_DRUGBANK
+
+        start = time.time()
+        drugbank = pd.read_csv(path, usecols=["DrugBank ID", "Common name", "Synonyms"])
+
+        # Candidate names in vocabulary order, first row wins for repeated names
+        self.exact = {}
+        for drug_id, common_name, synonyms in drugbank.itertuples(index=False):
+            names = [common_name] if pd.notna(common_name) else []
+            if pd.notna(synonyms):
+                names += synonyms.split("|")
+            for name in names:
+                key = normalize_name(name)
+                if key:
+                    self.exact.setdefault(key, drug_id)
+
+        self.candidates = list(self.exact.keys())
+        self.postings = defaultdict(list)
+        for i, name in enumerate(self.candidates):
+            for trigram in name_trigrams(name):
+                self.postings[trigram].append(i)
+
+        logger.info(f"Built drug name resolver with {len(self.candidates)} names in {time.time() - start}s...")
+
+    def fuzzy(self, drug: str, cutoff=0.8, shortlist=50):
+        """
+        Best near match of a normalized name as (name, score), or None below cutoff.
+        Only the candidates sharing the most trigrams with the query are rescored.
+        """
+        trigrams = name_trigrams(drug)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self.postings.get(trigram, ()))
+
+        best = None
+        matcher = difflib.SequenceMatcher(b=drug)
+        for i, _ in shared.most_common(shortlist):
+            matcher.set_seq1(self.candidates[i])
+            if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+                continue
+            score = matcher.ratio()
+            if score >= cutoff and (best is None or score > best[1]):
+                best = (self.candidates[i], score)
+        return best
+
+    def resolve(self, drugs, cutoff=0.8) -> list:
+        """
+        Resolve a list of drug names in one call.
+        Returns one dict per input: name, drug_id (None if not found), matched name and score.
+        """
+        results = []
+        for drug in drugs:
+            key = normalize_name(drug)
+            if key in self.exact:
+                match, score = key, 1.0
+            else:
+                match, score = self.fuzzy(key, cutoff=cutoff) or (None, 0.0)
+            results.append({
+                "name": drug,
+                "drug_id": self.exact[match] if match else None,
+                "match": match,
+                "score": score,
+            })
+        return results
+
+
+@lru_cache(maxsize=None)
+def get_drug_resolver() -> DrugNameResolver:
+    """Process-wide resolver over the default DrugBank vocabulary."""
+    return DrugNameResolver()
+
+
 def find_id_compound(drugs):
     """
-    Find DrugBank IDs for compounds based on exact matches in the DrugBank vocabulary.
+    Find DrugBank IDs for compounds based on exact matches in the DrugBank vocabulary,
+    falling back to the closest name or synonym.
     Args:
         drugs (list): List of drug names to match against the DrugBank vocabulary.
     Returns:
         list: List of DrugBank IDs for compounds that match the provided drug names.
         Compound::<id> format.
     """
-    drugbank = pd.read_csv(project_config.PATH_DRUGBANK)
-    drugbank["Synonym_List"] = drugbank["Synonyms"].fillna("").apply(lambda x: [s.strip() for s in x.split("|")])
-
-
-
     drug_ids = []
-
-    for drug in drugs:
-        # точное совпадение с Common name
-        mask_common = drugbank["Common name"].fillna("").apply(lambda val: match_exact(val, drug))
-
-        # точное совпадение с любым из синонимов
-        mask_synonym = drugbank["Synonym_List"].apply(lambda syns: any(match_exact(s, drug) for s in syns))
-
-        filt_drugbank = drugbank[mask_common | mask_synonym]
-
-        # если ничего не найдено — ищем наиболее похожее
-        if filt_drugbank.empty:
-            # объединяем список всех имён и синонимов
-            all_names = drugbank["Common name"].dropna().tolist()
-            all_synonyms = [s for sublist in drugbank["Synonym_List"] for s in sublist]
-            candidates = all_names + all_synonyms
-
-            match = difflib.get_close_matches(drug, candidates, n=1, cutoff=0.8)
-            if match:
-                matched = match[0]
-                filt_drugbank = drugbank[
-                    (drugbank["Common name"] == matched) |
-                    (drugbank["Synonym_List"].apply(lambda syns: matched in syns))
-                ]
-            else:
-                print(f"⚠️ Drug not found: {drug}")
-                continue
-
-        best_row = filt_drugbank.iloc[0]
-        drug_id = best_row["DrugBank ID"]
-        drug_ids.append(f"Compound::{drug_id}")
-    return(drug_ids)
\ No newline at end of file
+    for result in get_drug_resolver().resolve(drugs):
+        if result["drug_id"] is None:
+            print(f"⚠️ Drug not found: {result['name']}")
+            continue
+        drug_ids.append(f"Compound::{result['drug_id']}")
+    return drug_ids
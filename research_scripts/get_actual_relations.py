@@ -1,32 +1,199 @@
-import sys
+import threading
+import time
 
+import pandas as pd
+from loguru import logger
 
+import project_config
 from research_scripts.sheet_access import read_sheet
 
-def get_actual_relations(drug_ids, url=None):
-    if url is None:
-        url = "https://docs.google.com/spreadsheets/d/1K8hHouDr78dD9PByzvtDdIXxFaqrjUXFFw_CNfJGdaE/edit?pli=1&gid=1987581174#gid=1987581174"
+GLOSSARY_URL = "https://docs.google.com/spreadsheets/d/1K8hHouDr78dD9PByzvtDdIXxFaqrjUXFFw_CNfJGdaE/edit?pli=1&gid=1987581174#gid=1987581174"
+GLOSSARY_WORKSHEETS = ["relation_glossary_1_drug", "relation_glossary_2_drugs"]
 
-    if len(drug_ids) == 0:
-        print("No valid drugs found. Please provide at least one known drug.")
-        sys.exit(1)
-
-    elif len(drug_ids) == 1:
-        worksheet_name = "relation_glossary_1_drug"
 
-    elif len(drug_ids) == 2:
-        worksheet_name = "relation_glossary_2_drugs"
+def glossary_worksheet(n_drugs: int) -> str:
+    """
+    Worksheet with the relations to analyse for the given number of drugs.
+    Relations between drug pairs are also used for three or more drugs.
+    """
+    if n_drugs == 1:
+        return "relation_glossary_1_drug"
+    return "relation_glossary_2_drugs"
 
-    else:
-        print("More than two drugs are provided. Please provide only one or two drugs.")
-        sys.exit(1)
 
-    relation_glossary = read_sheet(
-        url=url,
-        worksheet_name=worksheet_name,
+def select_relations(relation_glossary: pd.DataFrame) -> set:
+    """Relations marked for analysis, or all of them if the glossary has no such column."""
+    if "Take_to_analysis" not in relation_glossary.columns:
+        return set(relation_glossary["Relation-name"].dropna())
+    return set(
+        relation_glossary[relation_glossary["Take_to_analysis"] == "yes"]["Relation-name"]
     )
-    actual_relations = relation_glossary[
-        relation_glossary["Take_to_analysis"] == "yes"
-    ]["Relation-name"].to_list()
 
-    return actual_relations
\ No newline at end of file
+
+class LocalGlossaryProvider:
+    """
+    Relation glossary read from files in data/drkg.
+    A worksheet is looked up as <worksheet>.tsv, then as a sheet of relation_glossary.xlsx,
+    then the plain DrKG relation_glossary.tsv is used. Files are re-read when they change.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or project_config.PATH_RELATION_GLOSSARY_DIR
+        self._cache = {}
+
+    def has_worksheet(self, worksheet_name) -> bool:
+        """True if the curated worksheet is present, as a TSV file or a sheet of the workbook."""
+        if (self.directory / f"{worksheet_name}.tsv").exists():
+            return True
+        workbook = self.directory / "relation_glossary.xlsx"
+        if not workbook.exists():
+            return False
+        try:
+            return worksheet_name in pd.ExcelFile(workbook).sheet_names
+        except ImportError as e:
+            logger.warning(f"Cannot read {workbook.name}: {e}")
+            return False
+
+    def available(self) -> bool:
+        """True if all worksheets of the curated glossary are present, not just the stock DrKG glossary."""
+        return all(self.has_worksheet(worksheet_name) for worksheet_name in GLOSSARY_WORKSHEETS)
+
+    def _candidates(self, worksheet_name):
+        return [
+            self.directory / f"{worksheet_name}.tsv",
+            self.directory / "relation_glossary.xlsx",
+            self.directory / "relation_glossary.tsv",
+        ]
+
+    def _read_file(self, path, worksheet_name):
+        if path.suffix == ".xlsx":
+            try:
+                return pd.read_excel(path, sheet_name=worksheet_name)
+            except ValueError:
+                # No sheet with this name in the workbook
+                return None
+            except ImportError as e:
+                logger.warning(f"Cannot read {path.name}: {e}")
+                return None
+        return pd.read_csv(path, sep="\t")
+
+    def read(self, worksheet_name: str) -> pd.DataFrame:
+        for path in self._candidates(worksheet_name):
+            if not path.exists():
+                continue
+            key = (worksheet_name, path)
+            mtime = path.stat().st_mtime
+            if key not in self._cache or self._cache[key][1] != mtime:
+                glossary = self._read_file(path, worksheet_name)
+                if glossary is None:
+                    continue
+                if path.name == "relation_glossary.tsv":
+                    logger.warning(f"No curated glossary for {worksheet_name}, using all DrKG relations")
+                self._cache[key] = (glossary, mtime)
+            return self._cache[key][0]
+        raise FileNotFoundError(f"No local relation glossary for {worksheet_name} in {self.directory}")
+
+
+class SheetsGlossaryProvider:
+    """
+    Relation glossary from Google Sheets kept in memory.
+    Worksheets are fetched in the background on creation and refreshed in the background
+    once older than ttl seconds, so reads only block until the first fetch completes.
+    A failed fetch is retried in the background with exponential backoff, meanwhile reads
+    fall back to the local glossary or fail at once instead of waiting on the network.
+    """
+
+    def __init__(self, url=GLOSSARY_URL, ttl=None, fallback=None, retry_base=None, retry_max=None):
+        self.url = url
+        self.ttl = project_config.RELATION_GLOSSARY_TTL if ttl is None else ttl
+        self.fallback = fallback
+        self.retry_base = retry_base or project_config.RELATION_GLOSSARY_RETRY_BASE
+        self.retry_max = retry_max or project_config.RELATION_GLOSSARY_RETRY_MAX
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._refreshing = {}
+        # worksheet -> (time before which it is not fetched again, consecutive failures)
+        self._failures = {}
+        for worksheet_name in GLOSSARY_WORKSHEETS:
+            self._refresh_in_background(worksheet_name)
+
+    def _fetch(self, worksheet_name):
+        try:
+            glossary = read_sheet(url=self.url, worksheet_name=worksheet_name)
+            with self._lock:
+                self._cache[worksheet_name] = (glossary, time.time())
+                self._failures.pop(worksheet_name, None)
+            logger.info(f"Fetched relation glossary {worksheet_name} from Google Sheets")
+        except Exception as e:
+            with self._lock:
+                failures = self._failures.get(worksheet_name, (0, 0))[1] + 1
+                backoff = min(self.retry_base * 2 ** (failures - 1), self.retry_max)
+                self._failures[worksheet_name] = (time.time() + backoff, failures)
+            logger.error(f"Failed to fetch relation glossary {worksheet_name}, retrying in {backoff}s: {e}")
+
+    def _refresh_in_background(self, worksheet_name):
+        """Start a fetch unless one is running or the last one failed recently, return its thread."""
+        with self._lock:
+            refreshing = self._refreshing.get(worksheet_name)
+            if refreshing is not None and refreshing.is_alive():
+                return refreshing
+            if worksheet_name in self._failures and time.time() < self._failures[worksheet_name][0]:
+                return None
+            thread = threading.Thread(target=self._fetch, args=(worksheet_name,), daemon=True)
+            self._refreshing[worksheet_name] = thread
+            thread.start()
+        return thread
+
+    def read(self, worksheet_name: str) -> pd.DataFrame:
+        cached = self._cache.get(worksheet_name)
+        if cached is None and worksheet_name not in self._failures:
+            # Nothing fetched yet, wait for the fetch started on creation
+            thread = self._refresh_in_background(worksheet_name)
+            if thread is not None:
+                thread.join()
+            cached = self._cache.get(worksheet_name)
+        elif cached is None or time.time() - cached[1] > self.ttl:
+            # Failed or stale, retried in the background once the backoff expired
+            self._refresh_in_background(worksheet_name)
+
+        if cached is None:
+            if self.fallback is not None:
+                logger.warning(f"Using local relation glossary for {worksheet_name}")
+                return self.fallback.read(worksheet_name)
+            raise RuntimeError(f"Relation glossary {worksheet_name} is not available")
+        return cached[0]
+
+
+_providers = {}
+
+
+def get_glossary_provider(url=None):
+    """
+    Process-wide glossary provider: the curated worksheets when present in data/drkg,
+    otherwise the cached Google Sheets backend, falling back to the local files
+    (the stock DrKG glossary, all relations) while Sheets is unreachable.
+    """
+    key = url or "default"
+    if key not in _providers:
+        local = LocalGlossaryProvider()
+        if url is None and local.available():
+            _providers[key] = local
+        else:
+            _providers[key] = SheetsGlossaryProvider(
+                url=url or GLOSSARY_URL,
+                fallback=local,
+            )
+    return _providers[key]
+
+
+def get_actual_relations(drug_ids, url=None, provider=None) -> set:
+    """Names of the relations to analyse for the given drugs."""
+    if len(drug_ids) == 0:
+        logger.warning("No valid drugs found. Please provide at least one known drug.")
+        return set()
+
+    if provider is None:
+        provider = get_glossary_provider(url)
+
+    relation_glossary = provider.read(glossary_worksheet(len(drug_ids)))
+    return select_relations(relation_glossary)
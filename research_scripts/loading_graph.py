@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import igraph as ig
 import project_config
@@ -20,6 +21,45 @@ def build_igraph_from_triplets(triplets):
     return g
 
 
+def build_igraph_from_store(store, edge_ids):
+    """
+    Build a graph from the selected rows of a TripletStore.
+    Vertices are named after the DrKG entities, edges carry the relation name.
+    """
+    heads = store.heads[edge_ids]
+    tails = store.tails[edge_ids]
+    relations = store.relations[edge_ids]
+
+    # Renumber only the entities present in the selected rows
+    nodes, inverse = np.unique(np.concatenate([heads, tails]), return_inverse=True)
+    edges = inverse.reshape(2, -1).T
+
+    g = ig.Graph(n=len(nodes), edges=edges.tolist(), directed=True)
+    g.vs['name'] = [store.entities[i] for i in nodes]
+    g.es['relation'] = [store.relation_names[r] for r in relations]
+
+    return g
+
+
+def build_drkg_graph(store, chunk_size=1_000_000):
+    """
+    Build the full DrKG graph from a TripletStore.
+    Vertex IDs are the entity IDs of the store and edge IDs are its row IDs,
+    so the store's relation index can be used to select edges of the graph.
+    """
+    g = ig.Graph(n=len(store.entities), directed=True)
+    g.vs['name'] = store.entities
+
+    # Add edges in chunks to avoid materialising millions of Python tuples at once
+    for start in range(0, len(store), chunk_size):
+        stop = start + chunk_size
+        g.add_edges(np.column_stack([store.heads[start:stop], store.tails[start:stop]]).tolist())
+
+    g.es['relation'] = np.array(store.relation_names, dtype=object)[store.relations].tolist()
+
+    return g
+
+
 def loading_graph(path_graph: str):
     if not path_graph:
         path_graph = project_config.PATH_DRKG
@@ -1,57 +1,131 @@
-import pandas as pd
+"""
+Builds entity_name_mapping.json (DrKG entity key -> human-readable name) from DrugBank,
+MeSH, DOID, HGNC and SIDER, and the binary entity name table the app reads.
+The sources are independent and parsed in parallel processes.
+
+Usage: python -m research_scripts.mapping_id
+"""
 import json
-import project_config
+import multiprocessing
+import resource
+import time
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
 import obonet
+import pandas as pd
+from loguru import logger
+
+import project_config
+from app.entity_names import compile_entity_name_table
+from research_scripts.triplet_store import get_triplet_store
 
 
-def create_entity_name_mapping():
-    # compound
+def compound_names() -> dict:
     df_compound = pd.read_csv(project_config.PATH_DRUGBANK_VOCABULARY)
     df_compound["DrugBank ID"] = "Compound::" + df_compound["DrugBank ID"]
     df_compound["Common name"] = "Compound::" + df_compound["Common name"]
-    mapping_compound = df_compound.set_index("DrugBank ID")["Common name"].to_dict()
+    return df_compound.set_index("DrugBank ID")["Common name"].to_dict()
 
-    # disease
-    tree = ET.parse(project_config.PATH_MESH)
-    root = tree.getroot()
 
+def mesh_names(path=None) -> dict:
+    """
+    MeSH descriptor names, streamed with iterparse: every DescriptorRecord is dropped
+    from the tree once read, so memory stays flat instead of holding the whole DOM.
+    """
     mapping_disease = {}
-
-    for record in root.findall(".//DescriptorRecord"):
-        mesh_ui = record.findtext("DescriptorUI")
-        name = record.find("DescriptorName/String").text
+    context = ET.iterparse(path or project_config.PATH_MESH, events=("start", "end"))
+    _, root = next(context)
+    for event, element in context:
+        if event != "end" or element.tag != "DescriptorRecord":
+            continue
+        mesh_ui = element.findtext("DescriptorUI")
+        name = element.findtext("DescriptorName/String")
         if mesh_ui and name:
             mapping_disease[f"Disease::MESH:{mesh_ui}"] = f"Disease::MESH:{name}"
+        root.clear()
+    return mapping_disease
+
 
-    # DOID
+def doid_names() -> dict:
     doid = obonet.read_obo(project_config.PATH_DOID)
-    doid_to_name = {
-        f"Disease::{node_id}": f"Disease::{data.get("name", "")}"
+    return {
+        f"Disease::{node_id}": f"Disease::{data.get('name', '')}"
         for node_id, data in doid.nodes(data=True)
         if node_id.startswith("DOID:")
     }
 
-    # gene
+
+def gene_names() -> dict:
     df_gene = pd.read_csv(project_config.PATH_HGNC, sep="\t")
     df_gene["HGNC ID"] = "Gene::" + df_gene["HGNC ID"].str.split(":").str[1]
     mapping_gene = df_gene.set_index("HGNC ID")["Approved symbol"].to_dict()
-    mapping_gene = {
+    return {
         k: f"Gene::{v}" for k, v in mapping_gene.items() if pd.notna(v)
     }
-    # Mapping Side Effect
+
+
+def side_effect_names() -> dict:
     df_side_effect = pd.read_csv(project_config.PATH_SIDER, sep="\t", header=None)
     df_side_effect[1] = "Side Effect::" + df_side_effect[1]
     df_side_effect[3] = "Side Effect::" + df_side_effect[3]
-    mapping_side_effect = df_side_effect.set_index(1)[3].to_dict()
-
-    entity_name_mapping = (
-        mapping_compound
-        | mapping_disease
-        | doid_to_name
-        | mapping_gene
-        | mapping_side_effect
-    )
+    return df_side_effect.set_index(1)[3].to_dict()
+
+
+# Later sources override earlier ones for the same key
+SOURCES = [compound_names, mesh_names, doid_names, gene_names, side_effect_names]
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed_source(source):
+    """
+    Run a source parser, returning its mapping, wall time, and the peak RSS of its process
+    in MB before and after it ran. Only meaningful in a fresh process running one source.
+    """
+    start, baseline_mb = time.time(), peak_rss_mb()
+    mapping = source()
+    return mapping, time.time() - start, baseline_mb, peak_rss_mb()
+
+
+def create_entity_name_mapping(parallel=True) -> dict:
+    """
+    Parse all sources, write entity_name_mapping.json and the entity name table.
+    In parallel every source runs in its own spawned process, so the peak RSS logged per
+    source is its own and not that of the parent or of another source. Run serially, the
+    peaks are those of the whole process so far.
+    """
+    start = time.time()
+    if parallel:
+        with ProcessPoolExecutor(
+            max_workers=len(SOURCES), mp_context=multiprocessing.get_context("spawn"), max_tasks_per_child=1,
+        ) as executor:
+            results = list(executor.map(timed_source, SOURCES))
+    else:
+        results = [timed_source(source) for source in SOURCES]
+
+    entity_name_mapping = {}
+    for source, (mapping, seconds, baseline_mb, peak_mb) in zip(SOURCES, results):
+        logger.info(
+            f"{source.__name__}: {len(mapping)} names in {seconds:.1f}s, "
+            f"peak RSS {peak_mb:.0f} MB ({peak_mb - baseline_mb:+.0f} MB while parsing)"
+        )
+        entity_name_mapping |= mapping
 
     with open(project_config.PATH_ENTITY_NAME_MAPPING, "w") as f:
         json.dump(entity_name_mapping, f)
+    compile_entity_name_table(get_triplet_store(), mapping=entity_name_mapping)
+
+    own_peak = peak_rss_mb()
+    children_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    logger.info(
+        f"Built {len(entity_name_mapping)} entity names in {time.time() - start:.1f}s, "
+        f"peak RSS {own_peak:.0f} MB (largest worker {children_peak:.0f} MB)"
+    )
+    return entity_name_mapping
+
+
+if __name__ == "__main__":
+    create_entity_name_mapping()
@@ -0,0 +1,120 @@
+from itertools import product
+
+from research_scripts.filtering_graph import expandable, resolve_vertices
+
+
+def expand(graph, frontier, visited, parents):
+    """
+    One BFS level: neighbours of the frontier not seen before, with all their parents
+    in the frontier. The neighbourhoods of the whole frontier come from a single bulk call.
+    """
+    if not frontier:
+        return []
+    next_level = {}
+    for v, neighbours in zip(frontier, graph.neighborhood(frontier, order=1, mode="all", mindist=1)):
+        for n in neighbours:
+            if n not in visited:
+                next_level.setdefault(n, []).append(v)
+    for n, ps in next_level.items():
+        visited.add(n)
+        parents[n] = ps
+    return list(next_level)
+
+
+def chains(v, parents, limit):
+    """Up to limit vertex chains from v back to a root of the search (a vertex without parents)."""
+    if not parents[v]:
+        return [[v]]
+    result = []
+    for parent in parents[v]:
+        for chain in chains(parent, parents, limit - len(result)):
+            result.append(chain + [v])
+            if len(result) >= limit:
+                return result
+    return result
+
+
+def find_paths(graph, sources, targets, max_hops=3, k=10, max_degree=None):
+    """
+    Up to k shortest paths (vertex index lists) from any source to any target with at most
+    max_hops edges, found by a bidirectional BFS that always grows the smaller frontier.
+    Sources and targets are vertex names or indices. Restrict the relations by passing a
+    relation view of the graph, and hubs by max_degree as in filter_graph: a hub can be on
+    a path but the search does not expand through it, unless it is a source or a target.
+    """
+    sources = resolve_vertices(graph, sources)
+    targets = resolve_vertices(graph, targets)
+    if not sources or not targets:
+        return []
+
+    forward = {"visited": set(sources), "parents": {v: [] for v in sources}, "frontier": list(sources)}
+    backward = {"visited": set(targets), "parents": {v: [] for v in targets}, "frontier": list(targets)}
+    meeting = [v for v in sources if v in backward["visited"]]
+    hops = 0
+    while not meeting and hops < max_hops and (forward["frontier"] or backward["frontier"]):
+        # Grow the smaller frontier, a side left with hubs only stops and the other one goes on
+        if not backward["frontier"] or 0 < len(forward["frontier"]) <= len(backward["frontier"]):
+            side, other = forward, backward
+        else:
+            side, other = backward, forward
+        level = expand(graph, side["frontier"], side["visited"], side["parents"])
+        meeting = [v for v in level if v in other["visited"]]
+        # Sources and targets are always expanded, the degree cap applies past hop 0
+        side["frontier"] = expandable(graph, level, max_degree)
+        hops += 1
+
+    paths = []
+    for v in meeting:
+        heads = chains(v, forward["parents"], k)
+        tails = chains(v, backward["parents"], k)
+        for head, tail in product(heads, tails):
+            path = head + tail[::-1][1:]
+            if path[0] != path[-1]:
+                paths.append(path)
+            if len(paths) >= k:
+                return paths
+    return paths
+
+
+def edges_between(graph, u, v):
+    """IDs of all edges between u and v, scanning the incident edges of the lower degree end only."""
+    if graph.degree(u) > graph.degree(v):
+        u, v = v, u
+    return [edge.index for edge in graph.es[graph.incident(u, mode="all")] if v in edge.tuple]
+
+
+def path_edges(graph, paths):
+    """{(u, v): [edge IDs]} of every step of the paths, parallel edges of other relations included."""
+    steps = {tuple(sorted(step)) for path in paths for step in zip(path, path[1:])}
+    return {(u, v): edges_between(graph, u, v) for u, v in steps}
+
+
+def path_subgraph(graph, paths):
+    """Compact subgraph made only of the vertices and edges of the paths."""
+    edge_ids = sorted(e for ids in path_edges(graph, paths).values() for e in ids)
+    return graph.subgraph_edges(edge_ids, delete_vertices=True)
+
+
+def relation_label(relation):
+    """'DRUGBANK::target::Compound:Gene' -> 'DRUGBANK::target', the entity types are on the path already."""
+    return "::".join(relation.split("::")[:2])
+
+
+def describe_paths(graph, paths, labels=None) -> list:
+    """
+    One line per path, 'A -[relation]- B -[relation]- C'.
+    labels maps vertex indices to display names, vertex names are used by default.
+    """
+    if labels is None:
+        labels = {v: graph.vs[v]["name"] for path in paths for v in path}
+    has_relations = "relation" in graph.es.attributes()
+    edges = path_edges(graph, paths)
+    lines = []
+    for path in paths:
+        parts = [labels[path[0]]]
+        for u, v in zip(path, path[1:]):
+            ids = edges[tuple(sorted((u, v)))]
+            names = sorted({relation_label(r) for r in graph.es[ids]["relation"]}) if has_relations else []
+            parts.append(f"-[{', '.join(names)}]- {labels[v]}")
+        lines.append(" ".join(parts))
+    return lines
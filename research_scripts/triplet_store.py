@@ -0,0 +1,152 @@
+import json
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+import project_config
+from research_scripts.build_artifacts import record_build
+
+HEADS_FILE = "heads.npy"
+RELATIONS_FILE = "relations.npy"
+TAILS_FILE = "tails.npy"
+RELATION_OFFSETS_FILE = "relation_offsets.npy"
+ENTITIES_FILE = "entities.json"
+RELATION_NAMES_FILE = "relation_names.json"
+
+
+class TripletStore:
+    """
+    DrKG triplets as integer arrays (head, relation, tail) plus the string tables
+    used to intern them. Arrays are memory-mapped, so every worker process reading
+    the same store shares the same pages.
+
+    Rows are sorted by relation and relation_offsets is a CSR-style index:
+    the triplets of relation r are rows relation_offsets[r]:relation_offsets[r + 1].
+    """
+
+    def __init__(self, heads, relations, tails, relation_offsets, entities, relation_names):
+        self.heads = heads
+        self.relations = relations
+        self.tails = tails
+        self.relation_offsets = relation_offsets
+        self.entities = entities
+        self.relation_names = relation_names
+        self._entity_index = None
+        self._relation_index = None
+
+    def __len__(self):
+        return len(self.relations)
+
+    @property
+    def entity_index(self):
+        """Entity name -> integer ID, built on first use."""
+        if self._entity_index is None:
+            self._entity_index = {name: i for i, name in enumerate(self.entities)}
+        return self._entity_index
+
+    @property
+    def relation_index(self):
+        """Relation name -> integer ID, built on first use."""
+        if self._relation_index is None:
+            self._relation_index = {name: i for i, name in enumerate(self.relation_names)}
+        return self._relation_index
+
+    def entity_ids(self, names):
+        """Integer IDs of the given entity names, unknown names are skipped."""
+        return [self.entity_index[n] for n in names if n in self.entity_index]
+
+    def relation_ids(self, names):
+        """Integer IDs of the given relation names, unknown and repeated names are skipped."""
+        return list(dict.fromkeys(self.relation_index[n] for n in names if n in self.relation_index))
+
+    def edges_for_relations(self, relation_ids):
+        """
+        Row IDs of all triplets with one of the given relations.
+        Costs a slice per relation, i.e. proportional to the output, not to the store.
+        """
+        ranges = [
+            np.arange(self.relation_offsets[r], self.relation_offsets[r + 1])
+            for r in sorted(set(relation_ids))
+        ]
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(ranges)
+
+
+def compile_triplet_store(path_drkg=None, store_dir=None):
+    """
+    One-time conversion of drkg.tsv into the binary triplet store.
+    Head/relation/tail strings are interned into int32 IDs and saved as .npy arrays
+    sorted by relation together with the per-relation row offsets,
+    the string tables are saved as JSON lists indexed by those IDs.
+    """
+    if path_drkg is None:
+        path_drkg = project_config.PATH_DRKG
+    if store_dir is None:
+        store_dir = project_config.PATH_DRKG_STORE
+
+    start = time.time()
+    drkg = pd.read_csv(path_drkg, sep="\t", header=None, dtype=str)
+    n = len(drkg)
+
+    entity_codes, entities = pd.factorize(pd.concat([drkg[0], drkg[2]], ignore_index=True))
+    relation_codes, relation_names = pd.factorize(drkg[1])
+
+    # Group the rows by relation, keeping the file order inside each relation
+    order = np.argsort(relation_codes, kind="stable")
+    counts = np.bincount(relation_codes, minlength=len(relation_names))
+    relation_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    store_dir.mkdir(parents=True, exist_ok=True)
+    np.save(store_dir / HEADS_FILE, entity_codes[:n][order].astype(np.int32))
+    np.save(store_dir / RELATIONS_FILE, relation_codes[order].astype(np.int32))
+    np.save(store_dir / TAILS_FILE, entity_codes[n:][order].astype(np.int32))
+    np.save(store_dir / RELATION_OFFSETS_FILE, relation_offsets)
+    with open(store_dir / ENTITIES_FILE, "w") as f:
+        json.dump(entities.tolist(), f)
+    with open(store_dir / RELATION_NAMES_FILE, "w") as f:
+        json.dump(relation_names.tolist(), f)
+
+    logger.info(
+        f"Compiled triplet store with {n} triplets, {len(entities)} entities "
+        f"and {len(relation_names)} relations in {time.time() - start}s"
+    )
+
+
+def load_triplet_store(store_dir=None) -> TripletStore:
+    """Memory-map the triplet store, compiling it from drkg.tsv first if it is missing."""
+    if store_dir is None:
+        store_dir = project_config.PATH_DRKG_STORE
+
+    if not (store_dir / RELATION_OFFSETS_FILE).exists():
+        logger.info(f"Triplet store not found in {store_dir}, compiling it from DrKG...")
+        compile_triplet_store(store_dir=store_dir)
+        if store_dir == project_config.PATH_DRKG_STORE:
+            record_build("triplet_store")
+
+    with open(store_dir / ENTITIES_FILE, "r") as f:
+        entities = json.load(f)
+    with open(store_dir / RELATION_NAMES_FILE, "r") as f:
+        relation_names = json.load(f)
+
+    return TripletStore(
+        heads=np.load(store_dir / HEADS_FILE, mmap_mode="r"),
+        relations=np.load(store_dir / RELATIONS_FILE, mmap_mode="r"),
+        tails=np.load(store_dir / TAILS_FILE, mmap_mode="r"),
+        relation_offsets=np.load(store_dir / RELATION_OFFSETS_FILE),
+        entities=entities,
+        relation_names=relation_names,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_triplet_store() -> TripletStore:
+    """Process-wide triplet store loaded from the default location."""
+    return load_triplet_store()
+
+
+if __name__ == "__main__":
+    compile_triplet_store()
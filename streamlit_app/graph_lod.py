@@ -0,0 +1,149 @@
+import random
+import threading
+
+import igraph as ig
+import numpy as np
+
+import project_config
+
+GROUP_PREFIX = "group:"
+CLUSTER_TYPE = "Cluster"
+
+
+def node_type(name):
+    return name.split('::')[0]
+
+
+# igraph draws from one process-wide generator, swapped for a seeded one while clustering
+_rng_lock = threading.Lock()
+
+
+def community_membership(g):
+    """
+    Multilevel modularity membership of g, seeded so the same graph gets the same
+    clusters on every rerun and the cluster names the user expanded stay valid.
+    """
+    with _rng_lock:
+        ig.set_random_number_generator(random.Random(0))
+        try:
+            return g.as_undirected().community_multilevel().membership
+        finally:
+            ig.set_random_number_generator(random)
+
+
+def is_collapsed(name):
+    """Super-nodes are group (Type::group:...) and cluster (Cluster::...) vertices."""
+    return node_type(name) == CLUSTER_TYPE or name.split('::', 1)[-1].startswith(GROUP_PREFIX)
+
+
+def contract(g, mapping, names, labels, counts):
+    """Copy of g with vertices merged by mapping, parallel edges and loops dropped."""
+    h = g.copy()
+    h.contract_vertices(mapping, combine_attrs="first")
+    h.simplify(combine_edges="first")
+    h.vs['name'] = names
+    h.vs['label'] = labels
+    h.vs['count'] = counts
+    return h
+
+
+def collapse_leaves(g, expanded=(), min_group=None):
+    """
+    Merge the leaves of the same type hanging off the same compound into one super-node
+    'Type::group:<compound>' with their count. Groups smaller than min_group or listed
+    in expanded are kept as they are.
+    """
+    min_group = min_group or project_config.GRAPH_LOD_MIN_GROUP
+    names = g.vs['name']
+    labels = g.vs['label'] if 'label' in g.vs.attributes() else names
+    counts = g.vs['count'] if 'count' in g.vs.attributes() else [1] * g.vcount()
+    types = np.array([node_type(name) for name in names])
+    degrees = np.asarray(g.degree())
+    edges = np.asarray(g.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+
+    # Leaf -> its only neighbour, from both ends of the edge list at once
+    leaf_edges = np.concatenate([edges[degrees[edges[:, 0]] == 1], edges[degrees[edges[:, 1]] == 1][:, ::-1]])
+    groups = {}
+    for leaf, parent in leaf_edges.tolist():
+        if types[parent] == 'Compound' and types[leaf] != 'Compound':
+            groups.setdefault((parent, types[leaf]), []).append(leaf)
+
+    mapping = list(range(g.vcount()))
+    merged = {}
+    for (parent, leaf_type), leaves in groups.items():
+        name = f"{leaf_type}::{GROUP_PREFIX}{names[parent]}"
+        if len(leaves) < min_group or name in expanded:
+            continue
+        merged[name] = (leaves, f"{len(leaves)} {leaf_type} of {labels[parent]}")
+        for leaf in leaves[1:]:
+            mapping[leaf] = leaves[0]
+    if not merged:
+        return g
+
+    # Dense IDs for contract_vertices, every group takes the ID of its first leaf
+    representatives = sorted(set(mapping))
+    dense = {v: i for i, v in enumerate(representatives)}
+    new_names = [names[v] for v in representatives]
+    new_labels = [labels[v] for v in representatives]
+    new_counts = [counts[v] for v in representatives]
+    for name, (leaves, label) in merged.items():
+        i = dense[leaves[0]]
+        new_names[i], new_labels[i], new_counts[i] = name, label, sum(counts[leaf] for leaf in leaves)
+    return contract(g, [dense[m] for m in mapping], new_names, new_labels, new_counts)
+
+
+def cluster(g, expanded=(), max_nodes=None):
+    """
+    Merge communities (multilevel modularity) of plain vertices into 'Cluster::<top member>'
+    super-nodes, largest first, until at most max_nodes vertices remain. Compounds,
+    super-nodes and members of expanded clusters stay visible.
+    """
+    max_nodes = max_nodes or project_config.GRAPH_LOD_MAX_NODES
+    if g.vcount() <= max_nodes:
+        return g
+    names = g.vs['name']
+    labels = g.vs['label'] if 'label' in g.vs.attributes() else names
+    counts = g.vs['count'] if 'count' in g.vs.attributes() else [1] * g.vcount()
+    degrees = g.degree()
+    membership = community_membership(g)
+
+    communities = {}
+    for v, community in enumerate(membership):
+        if node_type(names[v]) != 'Compound' and not is_collapsed(names[v]):
+            communities.setdefault(community, []).append(v)
+
+    mapping = list(range(g.vcount()))
+    merged = {}
+    remaining = g.vcount()
+    for members in sorted(communities.values(), key=len, reverse=True):
+        if remaining <= max_nodes or len(members) < 2:
+            break
+        top = max(members, key=lambda v: degrees[v])
+        name = f"{CLUSTER_TYPE}::{names[top]}"
+        if name in expanded:
+            continue
+        merged[name] = (members, f"{len(members)} entities around {labels[top]}")
+        for v in members:
+            mapping[v] = members[0]
+        remaining -= len(members) - 1
+    if not merged:
+        return g
+
+    representatives = sorted(set(mapping))
+    dense = {v: i for i, v in enumerate(representatives)}
+    new_names = [names[v] for v in representatives]
+    new_labels = [labels[v] for v in representatives]
+    new_counts = [counts[v] for v in representatives]
+    for name, (members, label) in merged.items():
+        i = dense[members[0]]
+        new_names[i], new_labels[i], new_counts[i] = name, label, sum(counts[v] for v in members)
+    return contract(g, [dense[m] for m in mapping], new_names, new_labels, new_counts)
+
+
+def level_of_detail(g, expanded=(), max_nodes=None, min_group=None):
+    """
+    Bounded view of a subgraph for rendering: leaf groups are collapsed first, then
+    communities if there are still more than max_nodes vertices. Super-nodes carry the
+    number of entities they stand for in 'count', expanded lists the super-nodes to open.
+    """
+    return cluster(collapse_leaves(g, expanded, min_group), expanded, max_nodes)
@@ -0,0 +1,243 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+
+import project_config
+from app.entity_names import entity_names
+
+# Define colors for different node types
+TYPE_COLORS = {
+    'Compound': '#FF6B6B',    # Red
+    'Disease': '#9B59B6',     # Violet
+    'Gene': '#45B7D1',        # Blue
+    'Side Effect': '#FFA07A', # Orange
+    'Cluster': '#95A5A6'      # Grey
+}
+
+TYPE_SIZES = {
+    'Compound': 28,
+    'Disease': 8,
+    'Gene': 14,
+    'Side Effect': 8,
+    'Cluster': 10,
+}
+
+
+# Layout algorithms that can start from given coordinates, with the fewer iterations
+# they need when most vertices are already in place
+SEEDED_LAYOUTS = {
+    'fr': ('layout_fruchterman_reingold', lambda n: {'niter': 30}),
+    'kk': ('layout_kamada_kawai', lambda n: {'maxiter': 5 * n}),
+}
+
+
+def graph_fingerprint(g) -> str:
+    """Hash of the vertex names and edges, equal graphs get the same layout."""
+    digest = hashlib.sha1()
+    digest.update("\n".join(g.vs['name']).encode("utf-8"))
+    digest.update(np.asarray(g.get_edgelist(), dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def seed_coordinates(g, previous, min_overlap=None):
+    """
+    Start coordinates from a previous layout (vertex names, coordinates): vertices already
+    placed keep their position, new ones start at the mean of their placed neighbours
+    or at random. None if less than min_overlap of the vertices were placed before,
+    a mostly new graph needs a full layout.
+    """
+    min_overlap = min_overlap or project_config.GRAPH_LAYOUT_SEED_MIN_OVERLAP
+    previous = dict(zip(previous[0], np.asarray(previous[1]).tolist()))
+    names = g.vs['name']
+    known = np.array([name in previous for name in names], dtype=bool)
+    if not known.any() or known.mean() < min_overlap:
+        return None
+    rng = np.random.default_rng(0)
+    coords = np.empty((len(names), 2))
+    coords[known] = [previous[name] for name, k in zip(names, known) if k]
+    spread = coords[known].std(axis=0) + 1e-6
+    center = coords[known].mean(axis=0)
+    for v in np.flatnonzero(~known).tolist():
+        placed = [n for n in g.neighbors(v) if known[n]]
+        base = coords[placed].mean(axis=0) if placed else center
+        coords[v] = base + rng.normal(scale=0.1, size=2) * spread
+    return coords.tolist()
+
+
+class LayoutCache:
+    """
+    Process-wide LRU of computed layouts keyed on (graph fingerprint, algorithm).
+    A missing layout is computed starting from the previous layout shown to the user,
+    given as (algorithm, vertex names, coordinates), when it was computed with the same
+    seedable algorithm and holds most of the vertices: a slightly changed graph converges
+    fast and keeps its shape, any other graph gets the full layout.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or project_config.GRAPH_LAYOUT_CACHE_SIZE
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, g, algorithm="fr", previous=None) -> np.ndarray:
+        key = (graph_fingerprint(g), algorithm)
+        with self._lock:
+            if key in self._layouts:
+                self._layouts.move_to_end(key)
+                return self._layouts[key]
+
+        seed = None
+        if previous and previous[0] == algorithm and algorithm in SEEDED_LAYOUTS:
+            seed = seed_coordinates(g, previous[1:])
+        if seed is not None:
+            method, iterations = SEEDED_LAYOUTS[algorithm]
+            layout = getattr(g, method)(seed=seed, **iterations(g.vcount()))
+        else:
+            layout = g.layout(algorithm)
+        coords = np.asarray(layout.coords, dtype=np.float32).reshape(-1, 2)
+
+        with self._lock:
+            self._layouts[key] = coords
+            while len(self._layouts) > self.max_entries:
+                self._layouts.popitem(last=False)
+        return coords
+
+
+layout_cache = LayoutCache()
+
+
+def edge_coordinates(edges, coords):
+    """
+    x and y arrays of all edge segments for a single line trace:
+    x0, x1, NaN per edge, the NaN breaks the line between edges.
+    """
+    if len(edges) == 0:
+        return np.empty(0), np.empty(0)
+    segments = np.full((len(edges), 3, 2), np.nan, dtype=coords.dtype)
+    segments[:, 0] = coords[edges[:, 0]]
+    segments[:, 1] = coords[edges[:, 1]]
+    return segments[:, :, 0].ravel(), segments[:, :, 1].ravel()
+
+
+def hover_texts(labels, names, node_type, indices, degrees, in_degrees, out_degrees):
+    return [
+        f"<b>{labels[i]}</b><br>"
+        f"Type: {node_type}<br>"
+        f"Name: {names[i]}<br>"
+        f"Connections: {degrees[i]}<br>"
+        f"In: {in_degrees[i]}, Out: {out_degrees[i]}"
+        for i in indices.tolist()
+    ]
+
+
+def plot_igraph_with_plotly(g, layout_algorithm="fr", width=800, height=800, layout=None, webgl=None):
+    """
+    Plot an igraph network using Plotly with node type coloring and interactivity
+
+    Parameters:
+    g: igraph.Graph object
+    layout_algorithm: str, layout algorithm ('fr', 'kk', 'circle', 'grid', etc.)
+    width, height: plot dimensions
+    layout: precomputed coordinates, by default the layout comes from layout_cache
+    webgl: force WebGL on or off, by default it is used above project_config.GRAPH_WEBGL_THRESHOLD
+
+    Coordinates, degrees and hover texts are computed with bulk igraph/NumPy calls.
+    """
+    if layout is None:
+        layout = layout_cache.get(g, layout_algorithm)
+    coords = np.asarray(layout.coords if hasattr(layout, "coords") else layout, dtype=np.float32).reshape(-1, 2)
+
+    # Extract node information
+    node_names = g.vs['name']
+    node_types = np.array([name.split('::')[0] for name in node_names])
+
+    # Use label if available, else look the names up in the entity name table
+    if 'label' in g.vs.attributes():
+        node_labels = g.vs['label']
+    else:
+        node_labels = entity_names.map_keys(node_names)
+
+    degrees = g.degree()
+    if g.is_directed():
+        in_degrees, out_degrees = g.indegree(), g.outdegree()
+    else:
+        in_degrees = out_degrees = [d // 2 for d in degrees]
+
+    if webgl is None:
+        webgl = g.vcount() + g.ecount() > project_config.GRAPH_WEBGL_THRESHOLD
+    # Super-nodes of the level-of-detail view grow with the number of entities they hold
+    counts = np.asarray(g.vs['count'] if 'count' in g.vs.attributes() else np.ones(g.vcount()))
+    size_factors = 1 + np.log2(counts)
+
+    scatter = go.Scattergl if webgl else go.Scatter
+
+    # Create the figure
+    fig = go.Figure()
+
+    # Add edges
+    edge_x, edge_y = edge_coordinates(np.asarray(g.get_edgelist(), dtype=np.int64).reshape(-1, 2), coords)
+    fig.add_trace(scatter(
+        x=edge_x, y=edge_y,
+        mode='lines',
+        line=dict(width=1.5, color='rgba(125,125,125,0.3)'),
+        hoverinfo='none',
+        showlegend=False,
+        name='Edges'
+    ))
+
+    # Add nodes for each type separately (for legend)
+    for node_type in np.unique(node_types):
+        type_indices = np.flatnonzero(node_types == node_type)
+        fig.add_trace(scatter(
+            x=coords[type_indices, 0], y=coords[type_indices, 1],
+            mode='markers',
+            marker=dict(
+                size=TYPE_SIZES.get(node_type, 10) * size_factors[type_indices],
+                color=TYPE_COLORS.get(node_type, '#CCCCCC'),
+                line=dict(width=1, color='white'),
+                opacity=0.8
+            ),
+            text=hover_texts(node_labels, node_names, node_type, type_indices, degrees, in_degrees, out_degrees),
+            customdata=[node_names[i] for i in type_indices.tolist()],
+            hovertemplate='%{text}<extra></extra>',
+            name=f'{node_type} ({len(type_indices)})',
+            legendgroup=node_type
+        ))
+
+    # Update layout
+    fig.update_layout(
+        title={
+            'text': f"Network Graph: {g.vcount()} nodes, {g.ecount()} edges",
+            'x': 0.5,
+            'font': {'size': 16}
+        },
+        width=width,
+        height=height,
+        showlegend=True,
+        hovermode='closest',
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01,
+            bgcolor="rgba(255,255,255,0.8)"
+        ),
+        xaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            showticklabels=False,
+            scaleanchor="y",
+            scaleratio=1
+        ),
+        yaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            showticklabels=False
+        ),
+        plot_bgcolor='white',
+        margin=dict(l=0, r=0, t=50, b=0)
+    )
+
+    return fig
@@ -0,0 +1,45 @@
+import random
+
+from app.graph_context import estimate_tokens, serialize_graph_context
+
+
+def graph_json(n_compounds=3, n_items=60, seed=0):
+    rng = random.Random(seed)
+    relations = ['genes_inhibited_or_suppressed_by_drug', 'disease_cured_by_drug', 'side_effects_assosiated_with_drug']
+    return {
+        relation: {
+            f"Compound::DB{c:05d}": [f"Gene::HGNC:{rng.randrange(10 ** 6)}-{rng.choice(['ABCB1', 'MTOR', 'X'])}" for _ in range(n_items)]
+            for c in range(n_compounds)
+        }
+        for relation in relations
+    }
+
+
+def test_context_within_budget():
+    data = graph_json()
+    full = serialize_graph_context(data, 10 ** 6)
+    assert estimate_tokens(full) > 500
+    for budget in [0, 1, 5, 10, 20, 40, 80, 160, 500, 1200]:
+        text = serialize_graph_context(data, budget)
+        assert estimate_tokens(text) <= budget
+
+
+def test_blocks_dropped_when_empty_lists_do_not_fit():
+    data = graph_json()
+    text = serialize_graph_context(data, 100)
+    assert text.startswith("inhibits genes:")
+    assert "side effects:" not in text
+    assert estimate_tokens(text) <= 100
+    assert serialize_graph_context(data, 0) == ""
+
+
+def test_sections_share_the_budget():
+    data = graph_json()
+    paths = [f"Compound::DB{i:05d} -[DRUGBANK::target]- Gene::{i} -[GNBR::E]- Compound::DB99999" for i in range(50)]
+    for budget in [0, 10, 50, 200, 1200]:
+        text = serialize_graph_context(data, budget, [("connections between the substances", paths)])
+        assert estimate_tokens(text) <= budget
+    text = serialize_graph_context(data, 1200, [("connections between the substances", paths)])
+    assert "connections between the substances:\n" + paths[0] in text
+    assert paths[-1] not in text
+    assert text.startswith("inhibits genes:")
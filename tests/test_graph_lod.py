@@ -0,0 +1,31 @@
+import igraph as ig
+
+from streamlit_app.graph_lod import level_of_detail
+
+
+def random_graph(n=600, p=0.01, seed=1):
+    """Random graph of genes and diseases around one compound, without leaves to group."""
+    g = ig.Graph.Erdos_Renyi(n, p)
+    g.add_edges([(v, (v + 1) % n) for v in range(n)])
+    g.vs["name"] = ["Compound::DB00001"] + [f"{'Gene' if v % 2 else 'Disease'}::{v}" for v in range(1, n)]
+    return g
+
+
+def test_clusters_graph_without_leaves():
+    g = random_graph()
+    assert min(g.degree()) > 1
+    view = level_of_detail(g, max_nodes=300, min_group=3)
+    assert view.vcount() <= 300
+    assert sum(view.vs["count"]) == g.vcount()
+    assert "Compound::DB00001" in view.vs["name"]
+
+
+def test_clusters_are_stable_across_reruns():
+    g = random_graph()
+    views = [level_of_detail(g, max_nodes=300, min_group=3) for _ in range(4)]
+    assert len({tuple(view.vs["name"]) for view in views}) == 1
+
+    cluster = next(name for name in views[0].vs["name"] if name.startswith("Cluster::"))
+    expanded = level_of_detail(g, expanded={cluster}, max_nodes=300, min_group=3)
+    assert cluster not in expanded.vs["name"]
+    assert level_of_detail(g, expanded={cluster}, max_nodes=300, min_group=3).vs["name"] == expanded.vs["name"]
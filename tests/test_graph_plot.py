@@ -0,0 +1,33 @@
+import igraph as ig
+import numpy as np
+
+from streamlit_app.graph_plot import LayoutCache, seed_coordinates
+
+
+def named_graph(n, offset=0):
+    g = ig.Graph.Erdos_Renyi(n, 0.1)
+    g.vs["name"] = [f"Gene::{offset + v}" for v in range(n)]
+    return g
+
+
+def test_seed_needs_most_vertices_placed():
+    previous = named_graph(50)
+    coords = np.asarray(previous.layout("fr").coords)
+    mostly_same = named_graph(50, offset=5)
+    mostly_new = named_graph(50, offset=40)
+    assert seed_coordinates(mostly_same, (previous.vs["name"], coords), min_overlap=0.8) is not None
+    assert seed_coordinates(mostly_new, (previous.vs["name"], coords), min_overlap=0.8) is None
+
+
+def test_seed_only_from_the_same_algorithm(monkeypatch):
+    previous = named_graph(50)
+    g = named_graph(50, offset=1)
+    calls = []
+    monkeypatch.setattr(ig.Graph, "layout_fruchterman_reingold",
+                        lambda self, **kwargs: calls.append(kwargs) or ig.Layout([[0, 0]] * self.vcount()))
+    cache = LayoutCache(max_entries=4)
+    circle = np.asarray(previous.layout("circle").coords)
+    cache.get(g, "fr", previous=("circle", previous.vs["name"], circle))
+    assert "seed" not in calls[-1]
+    cache.get(named_graph(50, offset=2), "fr", previous=("fr", previous.vs["name"], circle))
+    assert "seed" in calls[-1]
@@ -0,0 +1,32 @@
+import igraph as ig
+
+from research_scripts.path_search import find_paths
+
+
+def hub_graph():
+    """Compound::A has 5 genes, one of them also targeted by Compound::B."""
+    names = ["Compound::A", "Compound::B"] + [f"Gene::{i}" for i in range(5)]
+    g = ig.Graph(n=len(names), edges=[(0, i) for i in range(2, 7)] + [(1, 2)])
+    g.vs["name"] = names
+    return g
+
+
+def test_source_over_the_cap_is_expanded():
+    g = hub_graph()
+    assert find_paths(g, ["Compound::A"], ["Compound::B"]) == [[0, 2, 1]]
+    assert find_paths(g, ["Compound::A"], ["Compound::B"], max_degree={"Compound": 3}) == [[0, 2, 1]]
+    assert find_paths(g, ["Compound::B"], ["Compound::A"], max_degree=3) == [[1, 2, 0]]
+
+
+def test_hub_past_hop_0_is_not_expanded():
+    # Compound::C - Gene::0 - Gene::1 - Compound::D, both genes are hubs of degree 5
+    names = ["Compound::C", "Compound::D", "Gene::0", "Gene::1"] + [f"Disease::{i}" for i in range(6)]
+    edges = [(0, 2), (2, 3), (3, 1)] + [(2, i) for i in range(4, 7)] + [(3, i) for i in range(7, 10)]
+    g = ig.Graph(n=len(names), edges=edges)
+    g.vs["name"] = names
+    assert find_paths(g, ["Compound::C"], ["Compound::D"]) == [[0, 2, 3, 1]]
+    assert find_paths(g, ["Compound::C"], ["Compound::D"], max_degree={"Gene": 4}) == []
+    # A single hub can still be where both sides meet
+    g.delete_edges([(2, 3)])
+    g.add_edges([(0, 3)])
+    assert find_paths(g, ["Compound::C"], ["Compound::D"], max_degree={"Gene": 4}) == [[0, 3, 1]]